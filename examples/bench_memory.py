@@ -0,0 +1,65 @@
+"""
+Micro-benchmark for the per-request cost of django-xbench memory mode.
+
+Run from the repository root:
+
+    DJANGO_SECRET_KEY=dev PYTHONPATH=src python -m examples.bench_memory
+"""
+import os
+from time import perf_counter
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "examples.config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.http import HttpResponse  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+
+from django_xbench import conf  # noqa: E402
+from django_xbench.middleware import XBenchMiddleware  # noqa: E402
+
+REQUESTS = 5000
+
+
+def view(request):
+    # A modest, realistic amount of allocation (~200 small objects).
+    rows = [{"id": i, "name": f"row-{i}"} for i in range(100)]
+    return HttpResponse(str(len(rows)))
+
+
+def run(handler, request):
+    for _ in range(200):  # warm-up
+        handler(request)
+    start = perf_counter()
+    for _ in range(REQUESTS):
+        handler(request)
+    return (perf_counter() - start) / REQUESTS * 1e6
+
+
+def main():
+    request = RequestFactory().get("/bench/")
+    mw = XBenchMiddleware(view)
+
+    baseline = run(view, request)
+    cases = [
+        ("xbench (memory off)", {"MEMORY": False}),
+        ("memory, RSS only", {"MEMORY": True, "MEMORY_SAMPLE_RATE": 0.0}),
+        ("memory, 1% tracemalloc", {"MEMORY": True, "MEMORY_SAMPLE_RATE": 0.01}),
+        ("memory, 100% tracemalloc", {"MEMORY": True, "MEMORY_SAMPLE_RATE": 1.0}),
+    ]
+
+    print(f"{'mode':<26} {'us/request':>10} {'vs. bare view':>14}")
+    print(f"{'bare view':<26} {baseline:>10.1f} {'':>14}")
+    for label, overrides in cases:
+        conf.set_overrides(SLOW_AGG=False, **overrides)
+        try:
+            us = run(mw, request)
+        finally:
+            conf.clear_overrides()
+        print(f"{label:<26} {us:>10.1f} {us - baseline:>+13.1f}")
+
+
+if __name__ == "__main__":
+    main()
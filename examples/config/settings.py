@@ -39,7 +39,8 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'examples.demo', 
+    'django_xbench',
+    'examples.demo',
 ]
 
 MIDDLEWARE = [
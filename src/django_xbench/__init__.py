@@ -4,3 +4,12 @@ from logging import NullHandler
 __version__ = "0.1.6"
 
 logging.getLogger(__name__).addHandler(NullHandler())
+
+
+def __getattr__(name):
+    # Lazy: importing the package must not read Django settings.
+    if name == "measure":
+        from .tasks import measure
+
+        return measure
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
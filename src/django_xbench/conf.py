@@ -1,5 +1,13 @@
 from __future__ import annotations
 
+import json
+import logging
+import os
+import threading
+from dataclasses import asdict, dataclass, replace
+from time import monotonic
+from typing import Any, Dict
+
 from django.conf import settings
 
 
@@ -31,16 +39,18 @@ def _get_xbench_config() -> dict:
 _XBENCH = _get_xbench_config()
 
 
-def _get_bool(key: str, legacy_name: str, default: bool) -> bool:
-    if key in _XBENCH:
-        return bool(_XBENCH[key])
+def _get_bool(key: str, legacy_name: str, default: bool, src: dict | None = None) -> bool:
+    src = _XBENCH if src is None else src
+    if key in src:
+        return bool(src[key])
     return bool(_get_setting(legacy_name, default))
 
 
-def _get_int(key: str, legacy_name: str, default: int) -> int:
-    if key in _XBENCH:
+def _get_int(key: str, legacy_name: str, default: int, src: dict | None = None) -> int:
+    src = _XBENCH if src is None else src
+    if key in src:
         try:
-            return int(_XBENCH[key])
+            return int(src[key])
         except (TypeError, ValueError):
             return default
     try:
@@ -49,9 +59,23 @@ def _get_int(key: str, legacy_name: str, default: int) -> int:
         return default
 
 
-def _get_str_lower(key: str, legacy_name: str, default: str) -> str:
-    if key in _XBENCH:
-        return str(_XBENCH[key]).lower()
+def _get_float(key: str, legacy_name: str, default: float, src: dict | None = None) -> float:
+    src = _XBENCH if src is None else src
+    if key in src:
+        try:
+            return float(src[key])
+        except (TypeError, ValueError):
+            return default
+    try:
+        return float(_get_setting(legacy_name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _get_str_lower(key: str, legacy_name: str, default: str, src: dict | None = None) -> str:
+    src = _XBENCH if src is None else src
+    if key in src:
+        return str(src[key]).lower()
     return str(_get_setting(legacy_name, default)).lower()
 
 
@@ -80,6 +104,25 @@ XBENCH_SLOW_AGG_ENDPOINT_CAP = _get_int(
     "SLOW_ENDPOINT_CAP", "XBENCH_SLOW_AGG_ENDPOINT_CAP", 200
 )
 
+# Snapshot endpoint memoization (seconds); 0 disables reuse between polls.
+XBENCH_SLOW_AGG_CACHE_TTL = _get_float(
+    "SLOW_CACHE_TTL", "XBENCH_SLOW_AGG_CACHE_TTL", 2.0
+)
+
+# Periodic per-worker export of the window for `manage.py xbench_top`
+# (None disables). A tmpfs directory such as /dev/shm/xbench is recommended.
+XBENCH_SLOW_AGG_EXPORT_DIR = (
+    _XBENCH.get("SLOW_EXPORT_DIR") or _get_setting("XBENCH_SLOW_AGG_EXPORT_DIR", None) or None
+)
+XBENCH_SLOW_AGG_EXPORT_INTERVAL = _get_float(
+    "SLOW_EXPORT_INTERVAL", "XBENCH_SLOW_AGG_EXPORT_INTERVAL", 1.0
+)
+# Full-window binary dumps (`xbench-<pid>.xbw`) for `manage.py xbench_merge`,
+# written next to the JSON exports; 0 disables.
+XBENCH_SLOW_AGG_EXPORT_DUMP_INTERVAL = _get_float(
+    "SLOW_EXPORT_DUMP_INTERVAL", "XBENCH_SLOW_AGG_EXPORT_DUMP_INTERVAL", 10.0
+)
+
 # Legacy-only: some older configs specify a target window size (seconds).
 XBENCH_SLOW_AGG_WINDOW_SECONDS = _get_int(
     "SLOW_WINDOW_SECONDS", "XBENCH_SLOW_AGG_WINDOW_SECONDS", 0
@@ -89,3 +132,227 @@ XBENCH_SLOW_AGG_BUCKET_SECONDS_EXPLICIT = (
     "SLOW_BUCKET_SECONDS" in _XBENCH
     or getattr(settings, "XBENCH_SLOW_AGG_BUCKET_SECONDS", None) is not None
 )
+
+# OTLP span export: a file path (one OTLP/JSON request per line) or an
+# http(s):// OTLP/HTTP traces endpoint, e.g. http://127.0.0.1:4318/v1/traces.
+XBENCH_SPAN_EXPORT = (
+    _XBENCH.get("SPAN_EXPORT") or _get_setting("XBENCH_SPAN_EXPORT", None) or None
+)
+XBENCH_SPAN_SERVICE_NAME = (
+    _XBENCH.get("SPAN_SERVICE_NAME") or _get_setting("XBENCH_SPAN_SERVICE_NAME", None) or "django"
+)
+# Requests waiting for export; further requests are dropped (and counted).
+XBENCH_SPAN_QUEUE_SIZE = _get_int("SPAN_QUEUE_SIZE", "XBENCH_SPAN_QUEUE_SIZE", 2048)
+XBENCH_SPAN_BATCH_SIZE = _get_int("SPAN_BATCH_SIZE", "XBENCH_SPAN_BATCH_SIZE", 256)
+XBENCH_SPAN_FLUSH_INTERVAL = _get_float("SPAN_FLUSH_INTERVAL", "XBENCH_SPAN_FLUSH_INTERVAL", 1.0)
+# Per-query spans kept per request; later queries are only counted.
+XBENCH_SPAN_MAX_QUERIES = _get_int("SPAN_MAX_QUERIES", "XBENCH_SPAN_MAX_QUERIES", 100)
+
+# Optional per-host control file (JSON object with XBENCH-style keys) that is
+# polled at runtime, so every worker picks up toggles without a restart.
+XBENCH_CONTROL_FILE = (
+    _XBENCH.get("CONTROL_FILE") or _get_setting("XBENCH_CONTROL_FILE", None) or None
+)
+XBENCH_CONTROL_POLL_SECONDS = _get_float(
+    "CONTROL_POLL_SECONDS", "XBENCH_CONTROL_POLL_SECONDS", 1.0
+)
+
+
+# -----------------------------------------------------------------------------
+# Runtime configuration (hot-reloadable).
+#
+# The middleware reads a single immutable `RuntimeConfig` per request via
+# `get_config()`. Toggles replace the whole object, so readers never observe
+# a half-applied change and the hot path never touches Django settings.
+# -----------------------------------------------------------------------------
+
+logger = logging.getLogger("django_xbench")
+
+
+@dataclass(frozen=True)
+class RuntimeConfig:
+    """Settings that may be changed while the process is running."""
+
+    enabled: bool = True
+    log_enabled: bool = False
+    log_level: str = "info"
+    slow_agg_enabled: bool = False
+    # Fraction of requests to instrument (0.0–1.0).
+    sample_rate: float = 1.0
+    # Emit xbench's own cost as an `xbench-overhead` Server-Timing metric.
+    overhead_header: bool = False
+    # Read X-Request-Start / X-Queue-Start from the proxy and report queue time.
+    queue_time: bool = False
+    # Per-request memory tracking: RSS delta always, tracemalloc on a sample.
+    memory: bool = False
+    memory_sample_rate: float = 0.01
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _to_bool(value) -> bool:
+    # Form posts and hand-edited files carry strings; "false" must not be truthy.
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in ("1", "true", "yes", "on"):
+            return True
+        if lowered in ("0", "false", "no", "off", ""):
+            return False
+        raise ValueError(value)
+    return bool(value)
+
+
+def _clamp_rate(value) -> float:
+    return min(1.0, max(0.0, float(value)))
+
+
+# XBENCH key -> (RuntimeConfig field, coercion)
+RUNTIME_KEYS = {
+    "ENABLED": ("enabled", _to_bool),
+    "LOG": ("log_enabled", _to_bool),
+    "LOG_LEVEL": ("log_level", lambda v: str(v).lower()),
+    "SLOW_AGG": ("slow_agg_enabled", _to_bool),
+    "SAMPLE_RATE": ("sample_rate", _clamp_rate),
+    "OVERHEAD_HEADER": ("overhead_header", _to_bool),
+    "QUEUE_TIME": ("queue_time", _to_bool),
+    "MEMORY": ("memory", _to_bool),
+    "MEMORY_SAMPLE_RATE": ("memory_sample_rate", _clamp_rate),
+}
+
+
+def _config_from_settings() -> RuntimeConfig:
+    src = _get_xbench_config()
+    return RuntimeConfig(
+        enabled=_get_bool("ENABLED", "XBENCH_ENABLED", True, src),
+        log_enabled=_get_bool("LOG", "XBENCH_LOG_ENABLED", False, src),
+        log_level=_get_str_lower("LOG_LEVEL", "XBENCH_LOG_LEVEL", "info", src),
+        slow_agg_enabled=_get_bool("SLOW_AGG", "XBENCH_SLOW_AGG_ENABLED", False, src),
+        sample_rate=_clamp_rate(_get_float("SAMPLE_RATE", "XBENCH_SAMPLE_RATE", 1.0, src)),
+        overhead_header=_get_bool("OVERHEAD_HEADER", "XBENCH_OVERHEAD_HEADER", False, src),
+        queue_time=_get_bool("QUEUE_TIME", "XBENCH_QUEUE_TIME", False, src),
+        memory=_get_bool("MEMORY", "XBENCH_MEMORY", False, src),
+        memory_sample_rate=_clamp_rate(
+            _get_float("MEMORY_SAMPLE_RATE", "XBENCH_MEMORY_SAMPLE_RATE", 0.01, src)
+        ),
+    )
+
+
+def normalize_overrides(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validate and coerce a mapping of XBENCH-style keys to runtime field values.
+
+    Raises ValueError for unknown keys or values that cannot be coerced.
+    """
+    out: Dict[str, Any] = {}
+    for key, value in raw.items():
+        spec = RUNTIME_KEYS.get(str(key).upper())
+        if spec is None:
+            raise ValueError(f"unknown runtime setting: {key}")
+        name, coerce = spec
+        try:
+            out[name] = coerce(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid value for {key}: {value!r}") from None
+    return out
+
+
+_lock = threading.Lock()
+_base = _config_from_settings()
+_file_overrides: Dict[str, Any] = {}
+_api_overrides: Dict[str, Any] = {}
+_CONFIG = _base
+
+_control_mtime: float | None = None
+_next_poll = 0.0
+
+
+def _rebuild() -> None:
+    global _CONFIG
+    _CONFIG = replace(_base, **{**_file_overrides, **_api_overrides})
+
+
+def get_config() -> RuntimeConfig:
+    """
+    Return the current runtime configuration.
+
+    Cheap enough to call once per request: when a control file is configured,
+    its mtime is checked at most every `CONTROL_POLL_SECONDS`.
+    """
+    if XBENCH_CONTROL_FILE and monotonic() >= _next_poll:
+        _poll_control_file()
+    return _CONFIG
+
+
+def set_overrides(**changes: Any) -> RuntimeConfig:
+    """
+    Apply process-local runtime overrides (XBENCH-style keys, e.g. SAMPLE_RATE=0.1).
+
+    Overrides take precedence over settings and the control file.
+    """
+    values = normalize_overrides(changes)
+    with _lock:
+        _api_overrides.update(values)
+        _rebuild()
+        return _CONFIG
+
+
+def clear_overrides() -> RuntimeConfig:
+    """Drop process-local overrides set via `set_overrides()`."""
+    with _lock:
+        _api_overrides.clear()
+        _rebuild()
+        return _CONFIG
+
+
+def get_overrides() -> Dict[str, Any]:
+    """Return a copy of the active process-local overrides."""
+    with _lock:
+        return dict(_api_overrides)
+
+
+def reload_config() -> RuntimeConfig:
+    """Re-read Django settings (e.g. after `override_settings`) and rebuild the config."""
+    global _base
+    with _lock:
+        _base = _config_from_settings()
+        _rebuild()
+        return _CONFIG
+
+
+def _poll_control_file() -> None:
+    global _control_mtime, _next_poll
+    with _lock:
+        now = monotonic()
+        if now < _next_poll:
+            return
+        _next_poll = now + max(0.0, XBENCH_CONTROL_POLL_SECONDS)
+
+        try:
+            mtime = os.stat(XBENCH_CONTROL_FILE).st_mtime
+        except OSError:
+            mtime = None
+
+        if mtime == _control_mtime:
+            return
+        _control_mtime = mtime
+
+        if mtime is None:
+            _file_overrides.clear()
+            _rebuild()
+            return
+
+        try:
+            with open(XBENCH_CONTROL_FILE, encoding="utf-8") as fh:
+                raw = json.load(fh)
+            if not isinstance(raw, dict):
+                raise ValueError("control file must contain a JSON object")
+            values = normalize_overrides(raw)
+        except (OSError, ValueError) as exc:
+            # Keep the previous config; a half-written file must not disable monitoring.
+            logger.warning("[XBENCH] ignoring control file %s: %s", XBENCH_CONTROL_FILE, exc)
+            return
+
+        _file_overrides.clear()
+        _file_overrides.update(values)
+        _rebuild()
@@ -1,4 +1,100 @@
 import contextvars
+import threading
 
-db_duration_ctx = contextvars.ContextVar("db_duration_ctx", default=0.0)
-db_queries_ctx = contextvars.ContextVar("db_queries_ctx", default=0)
+
+class RequestMetrics:
+    """
+    Mutable per-request accumulator shared by every context copied from the request.
+
+    `contextvars` copies (threads started via `propagate`, `sync_to_async`)
+    see the same object, so increments made there reach the request. Updates
+    take a lock because fan-out code may run queries concurrently.
+    """
+
+    __slots__ = (
+        "db_duration", "db_queries", "overhead", "gc_time", "gc_count", "gc_gen2_count",
+        "conn_events", "query_log", "query_log_limit", "query_log_dropped", "thread_id", "_lock",
+    )
+
+    def __init__(self):
+        self.db_duration = 0.0
+        self.db_queries = 0
+        self.overhead = 0.0
+        self.gc_time = 0.0
+        self.gc_count = 0
+        self.gc_gen2_count = 0
+        # alias -> {"connect"|"commit"|"rollback": [seconds, count]}
+        self.conn_events = {}
+        # Individual queries for span export; None unless enable_query_log() was called.
+        self.query_log = None
+        self.query_log_limit = 0
+        self.query_log_dropped = 0
+        # Thread that owns the request (its connections are already instrumented).
+        self.thread_id = threading.get_ident()
+        self._lock = threading.Lock()
+
+    def add_query(self, duration, overhead=0.0):
+        with self._lock:
+            self.db_duration += duration
+            self.db_queries += 1
+            self.overhead += overhead
+
+    def enable_query_log(self, limit):
+        """Keep up to `limit` (start, duration, alias, vendor, sql) tuples; count the rest."""
+        self.query_log = []
+        self.query_log_limit = limit
+
+    def log_query(self, start, duration, alias, vendor, sql):
+        with self._lock:
+            if len(self.query_log) < self.query_log_limit:
+                self.query_log.append((start, duration, alias, vendor, sql))
+            else:
+                self.query_log_dropped += 1
+
+    def add_conn_event(self, alias, kind, duration, count=1):
+        """Record connection setup / commit / rollback time for a DB alias."""
+        with self._lock:
+            slot = self.conn_events.setdefault(alias, {}).setdefault(kind, [0.0, 0])
+            slot[0] += duration
+            slot[1] += count
+
+    def conn_totals(self, kind):
+        """Return (seconds, count) of `kind` events summed over all aliases."""
+        seconds, count = 0.0, 0
+        for events in self.conn_events.values():
+            slot = events.get(kind)
+            if slot:
+                seconds += slot[0]
+                count += slot[1]
+        return seconds, count
+
+    def merge_from(self, other):
+        """Fold a nested scope's totals into this one (e.g. a request inside a test)."""
+        for alias, events in list(other.conn_events.items()):
+            for kind, (seconds, count) in list(events.items()):
+                self.add_conn_event(alias, kind, seconds, count)
+        with self._lock:
+            self.db_duration += other.db_duration
+            self.db_queries += other.db_queries
+            self.overhead += other.overhead
+            if self.query_log is not None and other.query_log is not None:
+                room = max(0, self.query_log_limit - len(self.query_log))
+                self.query_log.extend(other.query_log[:room])
+                self.query_log_dropped += (
+                    other.query_log_dropped + max(0, len(other.query_log) - room)
+                )
+        self.gc_time += other.gc_time
+        self.gc_count += other.gc_count
+        self.gc_gen2_count += other.gc_gen2_count
+
+    def add_gc(self, duration, generation):
+        # Called from a gc callback, possibly while this thread holds `_lock`
+        # (a collection can trigger anywhere). Taking the lock here could
+        # deadlock, so rely on the GIL instead.
+        self.gc_time += duration
+        self.gc_count += 1
+        if generation >= 2:
+            self.gc_gen2_count += 1
+
+
+metrics_ctx = contextvars.ContextVar("metrics_ctx", default=None)
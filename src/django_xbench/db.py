@@ -1,11 +1,88 @@
+from contextlib import contextmanager, ExitStack
+from functools import wraps
 from time import perf_counter
-from .context import db_duration_ctx, db_queries_ctx
+
+from django.db import connections
+
+from .context import metrics_ctx
+from .overhead import QUERY_TIMER_COST, TIMER_COST
+
+# Connection-level operations timed separately from queries.
+CONN_EVENTS = ("connect", "commit", "rollback")
+
+# Last measured cost of RequestMetrics.add_query (seconds), see instrument_cursor.
+_add_query_cost = 0.0
+
 
 def instrument_cursor(execute, sql, params, many, context):
+    global _add_query_cost
     start_time = perf_counter()
     try:
         return execute(sql, params, many, context)
     finally:
-        dur = perf_counter() - start_time
-        db_duration_ctx.set(db_duration_ctx.get() + dur)
-        db_queries_ctx.set(db_queries_ctx.get() + 1)
+        end_time = perf_counter()
+        metrics = metrics_ctx.get()
+        # Session setup statements (e.g. SET ...) belong to connection time.
+        conn = context.get("connection")
+        connecting = getattr(conn, "_xbench_connecting", False)
+        if metrics is not None and not connecting:
+            if metrics.query_log is not None:
+                # Span export: keep the individual query (bounded).
+                metrics.log_query(start_time, end_time - start_time, conn.alias, conn.vendor, sql)
+            add_start = perf_counter()
+            # add_query cannot time itself; charge the last measured cost.
+            metrics.add_query(
+                end_time - start_time, (add_start - end_time) + QUERY_TIMER_COST + _add_query_cost
+            )
+            _add_query_cost = perf_counter() - add_start + TIMER_COST
+
+
+@contextmanager
+def instrument_connections():
+    """
+    Install `instrument_cursor` on every connection of the current thread.
+
+    Connections that are already instrumented by an enclosing scope are left
+    alone, so nested scopes never count a query twice.
+    """
+    with ExitStack() as stack:
+        for conn in connections.all():
+            _patch_connection(conn)
+            if instrument_cursor not in conn.execute_wrappers:
+                stack.enter_context(conn.execute_wrapper(instrument_cursor))
+        yield
+
+
+def _patch_connection(conn):
+    """
+    Time `connect()`, `_commit()` and `_rollback()` on a connection object (once).
+
+    Connection objects are per thread and long-lived, so the wrappers stay
+    installed and only record while a measurement scope is active.
+    """
+    if getattr(conn, "_xbench_patched", False):
+        return
+    conn._xbench_connecting = False
+    conn.connect = _timed(conn, conn.connect, "connect")
+    conn._commit = _timed(conn, conn._commit, "commit")
+    conn._rollback = _timed(conn, conn._rollback, "rollback")
+    conn._xbench_patched = True
+
+
+def _timed(conn, fn, kind):
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        metrics = metrics_ctx.get()
+        if metrics is None:
+            return fn(*args, **kwargs)
+        if kind == "connect":
+            conn._xbench_connecting = True
+        start = perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            if kind == "connect":
+                conn._xbench_connecting = False
+            metrics.add_conn_event(conn.alias, kind, perf_counter() - start)
+
+    return wrapper
@@ -0,0 +1,45 @@
+import gc
+import threading
+from time import perf_counter
+
+from .context import metrics_ctx
+
+# Start of the collection in progress. Collections never overlap (they run
+# with the GIL held), so one slot per process is enough.
+_gc_start = None
+_installed = False
+_install_lock = threading.Lock()
+
+
+def _on_gc(phase, info):
+    global _gc_start
+    if phase == "start":
+        _gc_start = perf_counter()
+        return
+    start, _gc_start = _gc_start, None
+    if start is None:
+        return
+    # The callback runs on the thread that triggered the collection, so the
+    # pause is charged to whichever request that thread is serving.
+    metrics = metrics_ctx.get()
+    if metrics is not None:
+        metrics.add_gc(perf_counter() - start, info.get("generation", 0))
+
+
+def install():
+    """Register the GC callback once per process (idempotent)."""
+    global _installed
+    if _installed:
+        return
+    with _install_lock:
+        if not _installed:
+            gc.callbacks.append(_on_gc)
+            _installed = True
+
+
+def uninstall():
+    global _installed
+    with _install_lock:
+        if _installed:
+            gc.callbacks.remove(_on_gc)
+            _installed = False
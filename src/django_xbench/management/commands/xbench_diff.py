@@ -0,0 +1,83 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from django_xbench.slowagg.diff import DIFF_KEYS, diff, load_stats, split_window
+from django_xbench.slowagg.dump import loads
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare two windows (window dumps, worker exports or snapshot JSON files), or "
+        "the latest interval of one dump with the interval before it, and print the "
+        "endpoints that changed most."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("before", help="Baseline file (or the only file with --split).")
+        parser.add_argument("after", nargs="?", default=None, help="File to compare against the baseline.")
+        parser.add_argument("--split", type=int, nargs="?", const=0, default=None, metavar="SECONDS",
+                            help="Compare the newest SECONDS of complete buckets of a single dump "
+                                 "(default: half of them) with the equal-length interval before it.")
+        parser.add_argument("-n", type=int, default=20, help="Number of endpoints to report.")
+        parser.add_argument("--sort", choices=DIFF_KEYS, default="damage",
+                            help="Rank by the absolute change of this metric.")
+        parser.add_argument("--min-count", type=int, default=5,
+                            help="Requests needed on each side to call a change significant.")
+        parser.add_argument("--z", type=float, default=1.96, help="z-score threshold (default: 1.96).")
+        parser.add_argument("--significant", action="store_true", help="Only list significant changes.")
+        parser.add_argument("--json", action="store_true", help="Print the diff as JSON.")
+
+    def handle(self, *args, **options):
+        try:
+            if options["split"] is not None:
+                if options["after"]:
+                    raise CommandError("--split takes a single dump file")
+                with open(options["before"], "rb") as fh:
+                    window = loads(fh.read())
+                before, after = split_window(
+                    window, options["split"] or None, now=window.current_bucket_start
+                )
+            else:
+                if not options["after"]:
+                    raise CommandError("pass two files, or one dump with --split")
+                before = load_stats(options["before"])
+                after = load_stats(options["after"])
+            rows = diff(
+                before, after,
+                n=max(1, options["n"]),
+                sort=options["sort"],
+                min_count=options["min_count"],
+                z=options["z"],
+                significant_only=options["significant"],
+            )
+        except OSError as exc:
+            raise CommandError(str(exc))
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        if options["json"]:
+            self.stdout.write(json.dumps(
+                {"sort": options["sort"], "rows": [r.to_dict() for r in rows]}, ensure_ascii=False
+            ))
+            return
+
+        header = (
+            f"{'':1} {'Count':>13}  {'Avg ms':>19}  {'Δ Avg':>7}  {'z':>6}  "
+            f"{'Avg Q':>11}  {'Δ Damage':>10}  Endpoint"
+        )
+        lines = [header, "-" * len(header)]
+        for r in rows:
+            d = r.to_dict()
+            change = f"{d['avg_change'] * 100:+6.1f}%" if d["avg_change"] is not None else d["status"]
+            lines.append(
+                f"{'*' if r.significant else ' '} "
+                f"{r.before.count:>6}→{r.after.count:<6}  "
+                f"{r.before.avg * 1000:>8.2f}→{r.after.avg * 1000:<9.2f}  {change:>7}  "
+                f"{r.avg_z:>6.1f}  {r.before.avg_q:>5.1f}→{r.after.avg_q:<5.1f}  "
+                f"{r.delta('damage'):>+8.3f} s  {r.endpoint}"
+            )
+        if not rows:
+            lines.append("No endpoints to compare")
+        lines.append("* significant change")
+        self.stdout.write("\n".join(lines))
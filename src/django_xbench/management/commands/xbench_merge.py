@@ -0,0 +1,65 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from django_xbench.slowagg.dump import dumps, loads
+from django_xbench.slowagg.export import SORT_KEYS
+from django_xbench.slowagg.report import format_table
+from django_xbench.slowagg.window import RollingWindow
+
+
+class Command(BaseCommand):
+    help = (
+        "Merge binary window dumps (e.g. one per host) into one window and print "
+        "the global top-N slow endpoints."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Window dump files.")
+        parser.add_argument("-n", type=int, default=20, help="Number of endpoints to report.")
+        parser.add_argument("--sort", choices=SORT_KEYS, default="damage")
+        parser.add_argument("--endpoint-cap", type=int, default=None,
+                            help="Endpoint cap of the merged window (default: sum of the inputs' caps).")
+        parser.add_argument("--output", metavar="PATH", default=None,
+                            help="Also write the merged window as a dump to PATH.")
+        parser.add_argument("--json", action="store_true", help="Print the snapshot as JSON.")
+
+    def handle(self, *args, **options):
+        windows = []
+        for path in options["paths"]:
+            try:
+                with open(path, "rb") as fh:
+                    windows.append(loads(fh.read()))
+            except OSError as exc:
+                raise CommandError(f"cannot open {path}: {exc}")
+            except ValueError as exc:
+                raise CommandError(f"{path}: {exc}")
+
+        cap = options["endpoint_cap"]
+        merged = RollingWindow(
+            bucket_seconds=windows[0].bucket_seconds,
+            bucket_count=max(w.bucket_count for w in windows),
+            endpoint_cap=cap if cap is not None else sum(w.endpoint_cap for w in windows),
+        )
+        # Judge the window at the newest dump's clock, not time.time().
+        now = max(w.current_bucket_start for w in windows)
+        merged.reset(now=now)
+        for path, window in zip(options["paths"], windows):
+            try:
+                merged.merge_from(window)
+            except ValueError as exc:
+                raise CommandError(f"{path}: {exc}")
+
+        if options["output"]:
+            with open(options["output"], "wb") as fh:
+                fh.write(dumps(merged, now=now))
+
+        snap = merged.snapshot(n=max(1, options["n"]), now=now, sort=options["sort"])
+        snap["sources"] = len(windows)
+
+        if options["json"]:
+            self.stdout.write(json.dumps(snap, ensure_ascii=False))
+            return
+
+        self.stdout.write(f"merged {len(windows)} window dumps")
+        self.stdout.write(format_table(snap))
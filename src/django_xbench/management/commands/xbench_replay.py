@@ -0,0 +1,145 @@
+import json
+import math
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from django_xbench.conf import (
+    XBENCH_SLOW_AGG_BUCKET_COUNT,
+    XBENCH_SLOW_AGG_ENDPOINT_CAP,
+)
+from django_xbench.slowagg import bucket_seconds as default_bucket_seconds
+from django_xbench.slowagg.dump import dumps
+from django_xbench.slowagg.ingest import batched, iter_csv, iter_jsonl
+from django_xbench.slowagg.report import format_table
+from django_xbench.slowagg.window import RollingWindow
+
+# Upper bound on buckets when the window is sized to the log; longer logs
+# get proportionally wider buckets.
+MAX_LOG_BUCKETS = 10000
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a JSONL/CSV request log through a RollingWindow and print the "
+        "top-N slow endpoints. Columns: timestamp, endpoint, duration_s, "
+        "[db_s], [query_count]. By default the window is sized to cover the whole log."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Log file path, or '-' for stdin.")
+        parser.add_argument("--format", choices=["jsonl", "csv"], default=None,
+                            help="Input format (default: guessed from the file extension).")
+        parser.add_argument("-n", type=int, default=20, help="Number of endpoints to report.")
+        parser.add_argument("--bucket-seconds", type=int, default=default_bucket_seconds)
+        parser.add_argument("--bucket-count", type=int, default=None,
+                            help="Fixed number of buckets (default: enough to cover the log).")
+        parser.add_argument("--live-window", action="store_true",
+                            help="Use the configured live window size instead of covering the log; "
+                                 "only the newest window of samples is reported.")
+        parser.add_argument("--endpoint-cap", type=int, default=XBENCH_SLOW_AGG_ENDPOINT_CAP)
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument("--json", action="store_true", help="Print the snapshot as JSON.")
+        parser.add_argument("--dump", metavar="PATH", default=None,
+                            help="Also write the final window as a binary dump (see xbench_merge).")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or ("csv" if path.endswith(".csv") else "jsonl")
+        read = iter_csv if fmt == "csv" else iter_jsonl
+        bucket_seconds = options["bucket_seconds"]
+        bucket_count = options["bucket_count"]
+        if options["live_window"] and bucket_count is None:
+            bucket_count = XBENCH_SLOW_AGG_BUCKET_COUNT
+
+        if path == "-":
+            fh = sys.stdin
+        else:
+            try:
+                fh = open(path, encoding="utf-8", newline="")
+            except OSError as exc:
+                raise CommandError(f"cannot open {path}: {exc}")
+
+        samples = read(fh)
+        seen = 0
+        first_ts = last_ts = None
+        try:
+            if bucket_count is None and bucket_seconds > 0:
+                # Cover the whole log: a first pass finds its time span.
+                if fh is sys.stdin:
+                    samples = list(samples)
+                    first_ts, last_ts = _time_span(samples)
+                else:
+                    first_ts, last_ts = _time_span(samples)
+                    fh.seek(0)
+                    samples = read(fh)
+                bucket_seconds, bucket_count = _log_window(first_ts, last_ts, bucket_seconds)
+            try:
+                window = RollingWindow(
+                    bucket_seconds=bucket_seconds,
+                    bucket_count=bucket_count,
+                    endpoint_cap=options["endpoint_cap"],
+                )
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            if first_ts is not None:
+                window.reset(now=int(first_ts))
+
+            for chunk in batched(samples, max(1, options["batch_size"])):
+                if last_ts is None:
+                    # Start the window at the log's own clock, not time.time().
+                    window.reset(now=int(min(s[0] for s in chunk)))
+                    last_ts = chunk[0][0]
+                last_ts = max(last_ts, *(s[0] for s in chunk))
+                seen += len(chunk)
+                window.update_many(chunk)
+        except ValueError as exc:
+            raise CommandError(f"{path}: {exc}")
+        finally:
+            if fh is not sys.stdin:
+                fh.close()
+
+        now = None if last_ts is None else int(last_ts)
+        snap = window.snapshot(n=max(1, options["n"]), now=now)
+        snap["samples"] = seen
+        snap["samples_in_window"] = sum(st.count for st in window.aggregate(now=now).values())
+
+        if options["dump"]:
+            try:
+                with open(options["dump"], "wb") as fh:
+                    fh.write(dumps(window, now=now))
+            except OSError as exc:
+                raise CommandError(f"cannot write {options['dump']}: {exc}")
+
+        if options["json"]:
+            self.stdout.write(json.dumps(snap, ensure_ascii=False))
+            return
+
+        self.stdout.write(
+            f"replayed {seen} samples ({snap['samples_in_window']} in final window of {snap['window_seconds']}s)"
+        )
+        self.stdout.write(format_table(snap))
+
+
+def _time_span(samples):
+    first = last = None
+    for sample in samples:
+        ts = sample[0]
+        if first is None or ts < first:
+            first = ts
+        if last is None or ts > last:
+            last = ts
+    return first, last
+
+
+def _log_window(first, last, bucket_seconds):
+    """(bucket_seconds, bucket_count) of a window covering `first`..`last`."""
+    if first is None:
+        return bucket_seconds, 1
+
+    def count(bs):
+        return (int(last) // bs - int(first) // bs) + 1
+
+    if count(bucket_seconds) > MAX_LOG_BUCKETS:
+        bucket_seconds *= math.ceil(count(bucket_seconds) / MAX_LOG_BUCKETS)
+    return bucket_seconds, count(bucket_seconds)
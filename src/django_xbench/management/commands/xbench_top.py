@@ -0,0 +1,97 @@
+import select
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from django_xbench.conf import XBENCH_SLOW_AGG_EXPORT_DIR
+from django_xbench.slowagg.export import SORT_KEYS, ExportReader, rank
+from django_xbench.slowagg.report import format_table
+
+try:
+    import termios
+    import tty
+except ImportError:  # pragma: no cover - Windows
+    termios = tty = None
+
+# Single-key sort shortcuts in interactive mode.
+SORT_SHORTCUTS = {
+    "d": "damage",
+    "a": "avg",
+    "m": "max",
+    "b": "db_ratio",
+    "k": "avg_q",
+    "c": "count",
+    "p": "cpu_total",
+}
+
+CLEAR = "\x1b[H\x1b[2J"
+
+
+class Command(BaseCommand):
+    help = (
+        "Live terminal view of slow endpoints, merged from the per-worker exports "
+        "written to XBENCH['SLOW_EXPORT_DIR']."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", default=XBENCH_SLOW_AGG_EXPORT_DIR,
+                            help="Export directory (default: XBENCH['SLOW_EXPORT_DIR']).")
+        parser.add_argument("--sort", choices=SORT_KEYS, default="damage")
+        parser.add_argument("-n", type=int, default=20)
+        parser.add_argument("--interval", type=float, default=1.0, help="Refresh interval in seconds.")
+        parser.add_argument("--max-age", type=float, default=30.0,
+                            help="Ignore exports older than this many seconds (dead workers).")
+        parser.add_argument("--once", action="store_true", help="Print one table and exit.")
+
+    def handle(self, *args, **options):
+        if not options["dir"]:
+            raise CommandError("no export directory: set XBENCH['SLOW_EXPORT_DIR'] or pass --dir")
+
+        reader = ExportReader(options["dir"], max_age=options["max_age"])
+        sort = options["sort"]
+        n = max(1, options["n"])
+
+        if options["once"]:
+            self.stdout.write(self._render(reader, sort, n))
+            return
+
+        interactive = termios is not None and sys.stdin.isatty()
+        saved = termios.tcgetattr(sys.stdin) if interactive else None
+        try:
+            if interactive:
+                tty.setcbreak(sys.stdin.fileno())
+            while True:
+                self.stdout.write(CLEAR + self._render(reader, sort, n, interactive=interactive))
+                self.stdout.flush()
+                key = self._wait_key(options["interval"], interactive)
+                if key == "q":
+                    return
+                sort = SORT_SHORTCUTS.get(key, sort)
+        except KeyboardInterrupt:
+            return
+        finally:
+            if saved is not None:
+                termios.tcsetattr(sys.stdin, termios.TCSADRAIN, saved)
+
+    def _render(self, reader, sort, n, *, interactive=False):
+        merged, workers = reader.read()
+        title = (
+            f"xbench top | workers={workers} endpoints={len(merged)} sort={sort} | "
+            f"{time.strftime('%H:%M:%S')}"
+        )
+        lines = [title]
+        if interactive:
+            lines.append("keys: d=damage a=avg m=max b=db% k=avg_q c=count p=cpu q=quit")
+        lines.append("")
+        lines.append(format_table({"top": rank(merged, n, sort)}))
+        return "\n".join(lines)
+
+    @staticmethod
+    def _wait_key(timeout, interactive):
+        # Sleep in select() so an idle refresh loop costs no CPU between frames.
+        if not interactive:
+            time.sleep(timeout)
+            return None
+        ready, _, _ = select.select([sys.stdin], [], [], timeout)
+        return sys.stdin.read(1) if ready else None
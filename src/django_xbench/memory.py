@@ -0,0 +1,87 @@
+import os
+import sys
+import threading
+import tracemalloc
+from random import random
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+# /proc/self is resolved when opened, so the descriptor is reopened after fork.
+_statm_fd = None
+_statm_pid = None
+
+# tracemalloc is process-wide: only one sampled request may own it at a time.
+_trace_lock = threading.Lock()
+
+
+def current_rss():
+    """
+    Resident set size of this process in bytes (0 if unavailable).
+
+    Uses a cached descriptor on /proc/self/statm (one pread per call). Other
+    platforms fall back to peak RSS from getrusage, which only grows.
+    """
+    global _statm_fd, _statm_pid
+    pid = os.getpid()
+    if _statm_pid != pid:
+        _statm_pid = pid
+        try:
+            _statm_fd = os.open("/proc/self/statm", os.O_RDONLY)
+        except OSError:
+            _statm_fd = None
+    if _statm_fd is not None:
+        try:
+            return int(os.pread(_statm_fd, 64, 0).split()[1]) * _PAGE_SIZE
+        except (OSError, ValueError, IndexError):
+            pass
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KiB, macOS bytes.
+        return peak if sys.platform == "darwin" else peak * 1024
+    return 0
+
+
+class MemoryProbe:
+    """
+    Measure memory for one request.
+
+    Every probe records the RSS delta. A probe that wins the sampling draw
+    (and finds tracemalloc free) also records the peak of Python allocations
+    made during the request, relative to the traced size at start.
+    """
+
+    __slots__ = ("rss_start", "traced", "_started_tracing", "_trace_base")
+
+    def __init__(self, sample_rate):
+        self.traced = False
+        self._started_tracing = False
+        self._trace_base = 0
+        if sample_rate > 0.0 and random() < sample_rate and _trace_lock.acquire(blocking=False):
+            self.traced = True
+            if tracemalloc.is_tracing():
+                # Someone else is tracing; measure relative to their baseline.
+                tracemalloc.reset_peak()
+                self._trace_base = tracemalloc.get_traced_memory()[0]
+            else:
+                tracemalloc.start()
+                self._started_tracing = True
+        self.rss_start = current_rss()
+
+    def stop(self):
+        """Return (rss_delta_bytes, alloc_peak_bytes or None)."""
+        rss_delta = current_rss() - self.rss_start
+        alloc_peak = None
+        if self.traced:
+            try:
+                alloc_peak = max(0, tracemalloc.get_traced_memory()[1] - self._trace_base)
+                if self._started_tracing:
+                    tracemalloc.stop()
+            finally:
+                self.traced = False
+                _trace_lock.release()
+        return rss_delta, alloc_peak
@@ -1,68 +1,77 @@
-from time import perf_counter
-from contextlib import ExitStack
-import logging
+from time import perf_counter, time
+from random import random
 
-from django.db import connections
 from django.urls import resolve, Resolver404
 
-from .context import db_duration_ctx, db_queries_ctx
-from .db import instrument_cursor
-from .slowagg import WINDOW
-from .conf import (
-    XBENCH_ENABLED,
-    XBENCH_LOG_ENABLED,
-    XBENCH_LOG_LEVEL,
-    XBENCH_SLOW_AGG_ENABLED,
-)
-
-logger = logging.getLogger("django_xbench")
+from . import gctrack
+from .tasks import Measurement, conn_fields, log, record
+from .queuetime import queue_time
+from .spans import KIND_SERVER, SPAN_EXPORTER, measurement_attributes, submit_span
+from .overhead import TIMER_COST
+from .streaming import wrap_streaming
+from .conf import get_config
 
 
 class XBenchMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
+        gctrack.install()
 
     def __call__(self, request):
-        if not XBENCH_ENABLED:
+        entry = perf_counter()
+        cfg = get_config()
+        if not cfg.enabled:
+            return self.get_response(request)
+        if cfg.sample_rate < 1.0 and random() >= cfg.sample_rate:
             return self.get_response(request)
 
-        db_duration_token = db_duration_ctx.set(0.0)
-        db_queries_token = db_queries_ctx.set(0)
-        start = perf_counter()
+        queued = queue_time(request.META, time()) if cfg.queue_time else None
+        trace = SPAN_EXPORTER is not None
+        measurement = Measurement(cfg.memory_sample_rate if cfg.memory else None, trace=trace)
+        metrics = measurement.metrics
+        measurement.begin()
 
         try:
-            with ExitStack() as stack:
-                for conn in connections.all():
-                    stack.enter_context(conn.execute_wrapper(instrument_cursor))
-                response = self.get_response(request)
-
-            total = perf_counter() - start
-            db_time = db_duration_ctx.get()
-            query_count = db_queries_ctx.get()
+            response = self.get_response(request)
+            end = measurement.end()
+            total = measurement.total
+            cpu_time = measurement.cpu_time
+            db_time = metrics.db_duration
+            query_count = metrics.db_queries
             app_time = max(0.0, total - db_time)
+            # Config lookup, queue-header parsing and Measurement setup ran
+            # before the measurement's own clock started.
+            overhead = measurement.overhead + (measurement.start - entry) + TIMER_COST
 
-            if XBENCH_SLOW_AGG_ENABLED:
+            route = None
+            if cfg.slow_agg_enabled or trace:
                 path = request.path_info.lstrip("/")
                 if not (path.startswith("__xbench__/") or path.startswith(".well-known/")):
                     try:
                         match = resolve(request.path_info)
-                        endpoint_key = match.route or request.path_info
+                        route = match.route or request.path_info
                     except Resolver404:
-                        endpoint_key = request.path_info
+                        route = request.path_info
+                    overhead += perf_counter() - end + TIMER_COST
+            endpoint_key = route if cfg.slow_agg_enabled else None
 
-                    WINDOW.update(
-                        endpoint_key,
-                        duration_s=total,
-                        db_s=db_time,
-                        query_count=query_count,
-                    )
+            header_start = perf_counter()
             current_timing = response.get("Server-Timing")
-            metrics = [
+            timings = [
                 f"xbench-total;dur={total * 1000:.3f}",
                 f"xbench-db;dur={db_time * 1000:.3f}",
                 f"xbench-app;dur={app_time * 1000:.3f}",
+                f"xbench-cpu;dur={cpu_time * 1000:.3f}",
+                f"xbench-gc;dur={metrics.gc_time * 1000:.3f}",
             ]
-            xbench_metrics = ", ".join(metrics)
+            if queued is not None:
+                timings.append(f"xbench-queue;dur={queued * 1000:.3f}")
+            for alias, events in metrics.conn_events.items():
+                for kind, (seconds, count) in events.items():
+                    timings.append(f"xbench-{kind}-{alias};dur={seconds * 1000:.3f}")
+            if cfg.overhead_header:
+                timings.append(f"xbench-overhead;dur={overhead * 1000:.3f}")
+            xbench_metrics = ", ".join(timings)
 
             if current_timing:
                 current_timing = current_timing.strip().strip(",")
@@ -72,21 +81,131 @@ class XBenchMiddleware:
 
             response["X-Bench-Queries"] = str(query_count)
 
-            if XBENCH_LOG_ENABLED:
-                msg = (
-                    f"[XBENCH] {request.method} {request.path} | "
-                    f"xbench_total={total * 1000:.3f}ms "
-                    f"xbench_db={db_time * 1000:.3f}ms "
-                    f"xbench_app={app_time * 1000:.3f}ms "
-                    f"q={query_count}"
+            if response.streaming and (endpoint_key is not None or cfg.log_enabled or trace):
+                # The body has not been produced yet: record once it is sent.
+                overhead += perf_counter() - header_start + TIMER_COST
+
+                def on_stream_done(timer):
+                    self._finish_stream(
+                        request, response, cfg, endpoint_key, route, timer,
+                        measurement=measurement, overhead=overhead, queued=queued,
+                    )
+
+                timer = wrap_streaming(response, measurement.start, on_stream_done)
+                if trace:
+                    timer.metrics.enable_query_log(metrics.query_log_limit)
+                return response
+
+            size = _response_size(response)
+            if endpoint_key is not None:
+                fields = measurement.fields()
+                overhead += perf_counter() - header_start + TIMER_COST
+                record(endpoint_key, overhead_s=overhead, queue_s=queued, bytes_sent=size, **fields)
+
+            if cfg.log_enabled:
+                log(
+                    cfg, f"{request.method} {request.path}", total, db_time, query_count, cpu_time,
+                    extra=f" bytes={size}",
                 )
-                if XBENCH_LOG_LEVEL == "debug":
-                    logger.debug(msg)
-                else:
-                    logger.info(msg)
+
+            if trace:
+                attributes = measurement_attributes(measurement)
+                attributes["http.response.body.size"] = size
+                _submit_request_span(request, response, route, measurement, attributes)
 
             return response
 
         finally:
-            db_duration_ctx.reset(db_duration_token)
-            db_queries_ctx.reset(db_queries_token)
+            measurement.close()
+
+    def _finish_stream(
+        self, request, response, cfg, endpoint_key, route, timer, *, measurement, overhead, queued,
+    ):
+        metrics = measurement.metrics
+        cpu_time = measurement.cpu_time
+        stream = timer.metrics
+        total = timer.ttlb
+        db_total = metrics.db_duration + stream.db_duration
+        queries = metrics.db_queries + stream.db_queries
+        cpu_total = cpu_time + timer.cpu
+        # The request part was merged on close(); add the body's counters too.
+        measurement.merge_stream(stream)
+
+        if endpoint_key is not None:
+            record(
+                endpoint_key,
+                duration_s=total,
+                db_s=db_total,
+                query_count=queries,
+                overhead_s=overhead + stream.overhead,
+                cpu_s=cpu_total,
+                gc_s=metrics.gc_time + stream.gc_time,
+                gc_count=metrics.gc_count + stream.gc_count,
+                gc_gen2_count=metrics.gc_gen2_count + stream.gc_gen2_count,
+                rss_delta=measurement.rss_delta,
+                alloc_peak=measurement.alloc_peak,
+                queue_s=queued,
+                bytes_sent=timer.bytes_sent,
+                ttfb_s=timer.ttfb,
+                stream_db_s=stream.db_duration,
+                **conn_fields(metrics, stream),
+            )
+
+        if cfg.log_enabled:
+            log(
+                cfg, f"{request.method} {request.path}", total, db_total, queries, cpu_total,
+                extra=f" ttfb={timer.ttfb * 1000:.3f}ms bytes={timer.bytes_sent}",
+            )
+
+        if SPAN_EXPORTER is not None:
+            attributes = measurement_attributes(measurement)
+            attributes.update({
+                "xbench.total_ms": total * 1000,
+                "xbench.db_ms": db_total * 1000,
+                "xbench.app_ms": max(0.0, total - db_total) * 1000,
+                "xbench.cpu_ms": cpu_total * 1000,
+                "xbench.queries": queries,
+                "xbench.ttfb_ms": timer.ttfb * 1000,
+                "http.response.body.size": timer.bytes_sent,
+            })
+            _submit_request_span(
+                request, response, route, measurement, attributes,
+                duration_s=total, extra_queries=stream.query_log or (),
+            )
+
+
+def _response_size(response):
+    """
+    Body size of a non-streaming response in bytes, without joining the body.
+
+    Prefers `Content-Length`; otherwise sums the chunks HttpResponse keeps
+    (`response.content` would copy them into one bytes object).
+    """
+    length = response.get("Content-Length")
+    if length is not None:
+        try:
+            return int(length)
+        except ValueError:
+            pass
+    container = getattr(response, "_container", None)
+    if container is not None:
+        return sum(len(chunk) for chunk in container)
+    return len(response.content)
+
+
+def _submit_request_span(request, response, route, measurement, attributes, **kwargs):
+    attributes.update({
+        "http.request.method": request.method,
+        "url.path": request.path,
+        "http.route": route,
+        "http.response.status_code": response.status_code,
+    })
+    submit_span(
+        measurement,
+        f"{request.method} {route}" if route else request.method,
+        KIND_SERVER,
+        attributes,
+        traceparent=request.META.get("HTTP_TRACEPARENT"),
+        error=response.status_code >= 500,
+        **kwargs,
+    )
@@ -0,0 +1,25 @@
+from time import perf_counter
+
+
+def calibrate_timer_cost(samples: int = 2000) -> float:
+    """
+    Estimate the cost (seconds) of one `perf_counter()` call.
+
+    Sections timed by xbench cannot see the cost of the timer reads that
+    delimit them, so the measured overhead is corrected by this amount per
+    read. The median of back-to-back deltas is robust to scheduler noise.
+    """
+    deltas = []
+    for _ in range(max(1, samples)):
+        t0 = perf_counter()
+        t1 = perf_counter()
+        deltas.append(t1 - t0)
+    deltas.sort()
+    return deltas[len(deltas) // 2]
+
+
+TIMER_COST = calibrate_timer_cost()
+
+# Per query, instrument_cursor adds two timer reads around `execute` and one
+# more to close its own bookkeeping section.
+QUERY_TIMER_COST = 3 * TIMER_COST
@@ -0,0 +1,190 @@
+"""
+pytest plugin: query-count and latency budgets for tests.
+
+Loaded automatically through the `pytest11` entry point when django-xbench
+is installed. Budgets are declared with a marker:
+
+    @pytest.mark.xbench(max_queries=5, max_db_ms=50)
+    def test_list(client):
+        client.get("/items/")
+
+and `--xbench-report` / `--xbench-baseline` write or compare per-test
+counters for every test.
+"""
+import json
+from time import perf_counter
+
+import pytest
+
+REPORT_VERSION = 1
+
+
+class XBenchRecorder:
+    """
+    Count DB queries and time for a block of test code.
+
+    Requests made through the test client are included: the middleware
+    merges its per-request counters into the enclosing recorder.
+    """
+
+    def __init__(self):
+        from .context import RequestMetrics
+
+        self.metrics = RequestMetrics()
+        self.elapsed = 0.0
+        self._start = None
+        self._token = None
+        self._instrument = None
+
+    def __enter__(self):
+        from .context import metrics_ctx
+        from .db import instrument_connections
+
+        self._token = metrics_ctx.set(self.metrics)
+        self._instrument = instrument_connections()
+        self._instrument.__enter__()
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        from .context import metrics_ctx
+
+        self.elapsed += perf_counter() - self._start
+        self._instrument.__exit__(*exc_info)
+        metrics_ctx.reset(self._token)
+        return False
+
+    @property
+    def queries(self):
+        return self.metrics.db_queries
+
+    @property
+    def db_ms(self):
+        return self.metrics.db_duration * 1000
+
+    @property
+    def total_ms(self):
+        return self.elapsed * 1000
+
+    def to_dict(self):
+        return {"queries": self.queries, "db_ms": round(self.db_ms, 3), "total_ms": round(self.total_ms, 3)}
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("xbench", "django-xbench query and latency budgets")
+    group.addoption("--xbench-report", metavar="PATH", default=None,
+                    help="Write per-test query counts and timings to PATH (JSON).")
+    group.addoption("--xbench-baseline", metavar="PATH", default=None,
+                    help="Fail tests that regress against a report written earlier.")
+    group.addoption("--xbench-query-tolerance", type=int, default=0,
+                    help="Extra queries allowed over the baseline (default: 0).")
+    group.addoption("--xbench-time-tolerance", type=float, default=0.5,
+                    help="Relative DB-time increase allowed over the baseline (default: 0.5).")
+    group.addoption("--xbench-time-slack-ms", type=float, default=5.0,
+                    help="Absolute DB-time slack added to the baseline, in ms (default: 5).")
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "xbench(max_queries=None, max_db_ms=None, max_ms=None): fail the test when it "
+        "exceeds the given query count, DB time or wall time budget.",
+    )
+    config._xbench_results = {}
+    config._xbench_baseline = {}
+    path = config.getoption("xbench_baseline", None)
+    if path:
+        try:
+            with open(path, encoding="utf-8") as fh:
+                config._xbench_baseline = json.load(fh).get("tests", {})
+        except (OSError, ValueError, AttributeError) as exc:
+            raise pytest.UsageError(f"--xbench-baseline: cannot read {path}: {exc}") from None
+
+
+@pytest.fixture
+def xbench(request):
+    """The XBenchRecorder measuring the current test's call phase."""
+    recorder = XBenchRecorder()
+    request.node._xbench_recorder = recorder
+    return recorder
+
+
+def _wants_recording(item):
+    config = item.config
+    return (
+        hasattr(item, "_xbench_recorder")
+        or item.get_closest_marker("xbench") is not None
+        or config.getoption("xbench_report", None)
+        or config.getoption("xbench_baseline", None)
+    )
+
+
+# Old-style wrapper: new-style (`wrapper=True`) hooks need pluggy >= 1.2.
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    if not _wants_recording(item):
+        yield
+        return
+
+    from django.conf import settings
+
+    if not settings.configured:
+        yield
+        return
+
+    recorder = getattr(item, "_xbench_recorder", None) or XBenchRecorder()
+    with recorder:
+        outcome = yield
+    if outcome.excinfo is not None:
+        return  # the test failed on its own
+
+    item.config._xbench_results[item.nodeid] = recorder.to_dict()
+    problems = _check_budget(item, recorder) + _check_baseline(item, recorder)
+    if problems:
+        exc = pytest.fail.Exception("xbench: " + "; ".join(problems), pytrace=False)
+        if hasattr(outcome, "force_exception"):
+            outcome.force_exception(exc)  # pluggy >= 1.1
+        else:
+            raise exc
+
+
+def _check_budget(item, recorder):
+    marker = item.get_closest_marker("xbench")
+    if marker is None:
+        return []
+    limits = marker.kwargs
+    problems = []
+    if limits.get("max_queries") is not None and recorder.queries > limits["max_queries"]:
+        problems.append(f"{recorder.queries} queries > max_queries={limits['max_queries']}")
+    if limits.get("max_db_ms") is not None and recorder.db_ms > limits["max_db_ms"]:
+        problems.append(f"db {recorder.db_ms:.1f}ms > max_db_ms={limits['max_db_ms']}")
+    if limits.get("max_ms") is not None and recorder.total_ms > limits["max_ms"]:
+        problems.append(f"total {recorder.total_ms:.1f}ms > max_ms={limits['max_ms']}")
+    return problems
+
+
+def _check_baseline(item, recorder):
+    base = item.config._xbench_baseline.get(item.nodeid)
+    if not base:
+        return []
+    opt = item.config.getoption
+    problems = []
+    allowed_q = base.get("queries", 0) + opt("xbench_query_tolerance")
+    if recorder.queries > allowed_q:
+        problems.append(f"{recorder.queries} queries > baseline {base.get('queries', 0)}")
+    allowed_db = base.get("db_ms", 0.0) * (1 + opt("xbench_time_tolerance")) + opt("xbench_time_slack_ms")
+    if recorder.db_ms > allowed_db:
+        problems.append(f"db {recorder.db_ms:.1f}ms > baseline {base.get('db_ms', 0.0):.1f}ms")
+    return problems
+
+
+def pytest_sessionfinish(session):
+    config = session.config
+    path = config.getoption("xbench_report", None)
+    if not path or not getattr(config, "_xbench_results", None):
+        return
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(
+            {"version": REPORT_VERSION, "tests": config._xbench_results},
+            fh, indent=2, sort_keys=True,
+        )
@@ -0,0 +1,53 @@
+# Proxy headers carrying the time a request entered the front-end, in order of preference.
+QUEUE_HEADERS = ("HTTP_X_REQUEST_START", "HTTP_X_QUEUE_START")
+
+# Larger queue times are treated as clock problems, not queueing.
+MAX_QUEUE_SECONDS = 3600.0
+
+
+def parse_request_start(value):
+    """
+    Parse an `X-Request-Start` / `X-Queue-Start` value into epoch seconds.
+
+    Accepts the common proxy formats, with or without a `t=` prefix:
+    seconds with a fraction (nginx `t=${msec}`), milliseconds (Heroku,
+    HAProxy `%Ts%ms`), microseconds (Apache `%t`) and nanoseconds. The unit is
+    inferred from the magnitude. Returns None for anything unparsable.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.startswith("t="):
+        value = value[2:]
+    try:
+        ts = float(value)
+    except ValueError:
+        return None
+    if ts <= 0:
+        return None
+    if ts > 1e17:
+        return ts / 1e9
+    if ts > 1e14:
+        return ts / 1e6
+    if ts > 1e11:
+        return ts / 1e3
+    return ts
+
+
+def queue_time(meta, now):
+    """
+    Return seconds spent queued before Django saw the request, or None.
+
+    `meta` is `request.META`; `now` is the wall-clock time (epoch seconds)
+    at which the middleware started. Small negative values from clock skew
+    between proxy and app host are clamped to zero.
+    """
+    for key in QUEUE_HEADERS:
+        start = parse_request_start(meta.get(key))
+        if start is None:
+            continue
+        queued = now - start
+        if queued > MAX_QUEUE_SECONDS or queued < -MAX_QUEUE_SECONDS:
+            return None
+        return max(0.0, queued)
+    return None
@@ -1,10 +1,16 @@
 from .window import RollingWindow
+from .cache import SnapshotCache
+from .export import WindowExporter
 from ..conf import (
     XBENCH_SLOW_AGG_BUCKET_SECONDS,
     XBENCH_SLOW_AGG_BUCKET_COUNT,
     XBENCH_SLOW_AGG_ENDPOINT_CAP,
     XBENCH_SLOW_AGG_WINDOW_SECONDS,
     XBENCH_SLOW_AGG_BUCKET_SECONDS_EXPLICIT,
+    XBENCH_SLOW_AGG_CACHE_TTL,
+    XBENCH_SLOW_AGG_EXPORT_DIR,
+    XBENCH_SLOW_AGG_EXPORT_INTERVAL,
+    XBENCH_SLOW_AGG_EXPORT_DUMP_INTERVAL,
 )
 
 
@@ -26,3 +32,16 @@ WINDOW = RollingWindow(
     bucket_count=bucket_count,
     endpoint_cap=int(XBENCH_SLOW_AGG_ENDPOINT_CAP),
 )
+
+SNAPSHOT_CACHE = SnapshotCache(WINDOW, ttl=XBENCH_SLOW_AGG_CACHE_TTL)
+
+EXPORTER = (
+    WindowExporter(
+        WINDOW,
+        XBENCH_SLOW_AGG_EXPORT_DIR,
+        interval=XBENCH_SLOW_AGG_EXPORT_INTERVAL,
+        dump_interval=XBENCH_SLOW_AGG_EXPORT_DUMP_INTERVAL,
+    )
+    if XBENCH_SLOW_AGG_EXPORT_DIR
+    else None
+)
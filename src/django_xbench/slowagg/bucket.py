@@ -26,20 +26,13 @@ class Bucket:
         """Reset bucket contents."""
         self.data.clear()
 
-    def update(
-        self,
-        endpoint_key: str,
-        *,
-        duration_s: float,
-        db_s: float = 0.0,
-        query_count: int = 0,
-        n: int = 1,
-    ) -> None:
+    def update(self, endpoint_key: str, **fields) -> None:
         """
         Update stats for an endpoint within this bucket.
 
-        If the number of unique endpoints exceeds `endpoint_cap`,
-        new unseen endpoints are aggregated into "__other__".
+        `fields` are passed to `EndpointStats.update()`. If the number of
+        unique endpoints exceeds `endpoint_cap`, new unseen endpoints are
+        aggregated into "__other__".
         """
         key = self._resolve_key(endpoint_key)
         stats = self.data.get(key)
@@ -47,12 +40,21 @@ class Bucket:
             stats = EndpointStats()
             self.data[key] = stats
 
-        stats.update(
-            duration_s=duration_s,
-            db_s=db_s,
-            query_count=query_count,
-            n=n,
-        )
+        stats.update(**fields)
+
+    def merge(self, endpoint_key: str, stats: EndpointStats) -> None:
+        """
+        Merge pre-aggregated stats for an endpoint into this bucket.
+
+        Applies the same endpoint cap as `update()`. `stats` is not modified
+        or retained.
+        """
+        key = self._resolve_key(endpoint_key)
+        current = self.data.get(key)
+        if current is None:
+            current = EndpointStats()
+            self.data[key] = current
+        current.merge_from(stats)
 
     def iter_items(self) -> Iterable[Tuple[str, EndpointStats]]:
         """Iterate (endpoint_key, EndpointStats) pairs."""
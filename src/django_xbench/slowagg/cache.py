@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from dataclasses import field
+from typing import Callable, Dict, Tuple
+
+from .compat import dataclass_slots
+from .window import RollingWindow
+
+
+@dataclass_slots()
+class SnapshotEntry:
+    """
+    A memoized snapshot plus its validator and rendered representations.
+
+    `rendered` holds serialized bodies keyed by representation name
+    (e.g. "json", "html") so repeated polls skip re-serialization too.
+    """
+
+    key: Tuple[int, str, int]
+    created: float
+    snapshot: Dict[str, object]
+    etag: str
+    rendered: Dict[str, str] = field(default_factory=dict)
+
+
+class SnapshotCache:
+    """
+    Short-lived memoization layer in front of `RollingWindow.snapshot()`.
+
+    Entries are keyed by (n, sort, current bucket start), so a bucket rotation
+    always forces a rebuild. Within a bucket, an entry is reused for at
+    most `ttl` seconds; requests arriving during that time may therefore
+    miss the most recent samples.
+
+    The ETag is derived from the ranked rows only (not `generated_at`),
+    so a rebuild that yields identical data keeps the same validator.
+    """
+
+    def __init__(
+        self,
+        window: RollingWindow,
+        *,
+        ttl: float = 2.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.window = window
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: Dict[Tuple[int, str], SnapshotEntry] = {}
+        self._lock = threading.Lock()
+
+    def get(self, n: int = 20, *, now: int | None = None, sort: str = "damage") -> SnapshotEntry:
+        """Return a fresh-enough snapshot entry for (`n`, `sort`), rebuilding if needed."""
+        self.window.rotate_if_needed(now=now)
+        key = (n, sort, self.window.current_bucket_start)
+        t = self._clock()
+
+        with self._lock:
+            entry = self._entries.get((n, sort))
+            if entry is not None and entry.key == key and (t - entry.created) < self.ttl:
+                return entry
+
+        snap = self.window.snapshot(n=n, now=now, sort=sort)
+        entry = SnapshotEntry(key=key, created=t, snapshot=snap, etag=_etag_for(snap, n))
+
+        with self._lock:
+            self._entries[(n, sort)] = entry
+        return entry
+
+    def clear(self) -> None:
+        """Drop all memoized entries."""
+        with self._lock:
+            self._entries.clear()
+
+
+def _etag_for(snap: Dict[str, object], n: int) -> str:
+    payload = json.dumps(
+        [n, snap["sort"], snap["window_seconds"], snap["bucket_seconds"], snap["top"]],
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:20]
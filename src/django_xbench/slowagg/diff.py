@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import heapq
+import json
+import math
+from typing import Dict, List, Tuple
+
+from .compat import dataclass_slots
+from .dump import MAGIC, loads
+from .stats import EndpointStats
+from .window import RollingWindow
+
+# Metrics compared per endpoint; any of them can rank the diff.
+DIFF_KEYS = ("damage", "avg", "max", "db_ratio", "avg_q")
+
+
+@dataclass_slots()
+class EndpointDiff:
+    """
+    Change of one endpoint between two aggregates ("before" and "after").
+
+    `avg_z` is Welch's z-score of the change in mean duration; `avg_q_z` the
+    z-score of the change in mean query count, treating per-request counts
+    as Poisson. `significant` is set when either exceeds the threshold and
+    both sides have enough requests (or, for new/gone endpoints, the side
+    that exists does).
+    """
+
+    endpoint: str
+    before: EndpointStats
+    after: EndpointStats
+    avg_z: float = 0.0
+    avg_q_z: float = 0.0
+    significant: bool = False
+
+    @property
+    def status(self) -> str:
+        if self.before.count == 0:
+            return "new"
+        if self.after.count == 0:
+            return "gone"
+        return "changed"
+
+    def delta(self, key: str) -> float:
+        return getattr(self.after, key) - getattr(self.before, key)
+
+    def to_dict(self) -> Dict[str, object]:
+        row: Dict[str, object] = {
+            "endpoint": self.endpoint,
+            "status": self.status,
+            "count_before": self.before.count,
+            "count_after": self.after.count,
+        }
+        for key in DIFF_KEYS:
+            before = getattr(self.before, key)
+            after = getattr(self.after, key)
+            row[f"{key}_before"] = before
+            row[f"{key}_after"] = after
+            row[f"{key}_delta"] = after - before
+        row["avg_change"] = (self.after.avg / self.before.avg - 1.0) if self.before.avg > 0 else None
+        row["avg_z"] = self.avg_z
+        row["avg_q_z"] = self.avg_q_z
+        row["significant"] = self.significant
+        return row
+
+
+def diff(
+    before: Dict[str, EndpointStats],
+    after: Dict[str, EndpointStats],
+    *,
+    n: int = 20,
+    sort: str = "damage",
+    min_count: int = 5,
+    z: float = 1.96,
+    significant_only: bool = False,
+) -> List[EndpointDiff]:
+    """
+    Rank per-endpoint changes from `before` to `after` by |delta of `sort`|.
+
+    Works on aggregates such as `RollingWindow.aggregate()` or
+    `load_stats()` output. One pass over the union of endpoints plus a
+    partial sort, so it stays cheap for thousands of endpoints.
+
+    When a side has no squared-duration sum (older exports), its variance
+    is approximated as avg² (coefficient of variation 1), a conservative
+    guess for latency distributions.
+    """
+    if sort not in DIFF_KEYS:
+        raise ValueError(f"unknown sort key: {sort}")
+    if n <= 0:
+        return []
+
+    empty = EndpointStats()
+    rows = []
+    for key in before.keys() | after.keys():
+        a = before.get(key, empty)
+        b = after.get(key, empty)
+        if a.count == 0 and b.count == 0:
+            continue
+        row = EndpointDiff(endpoint=key, before=a, after=b)
+        _score(row, min_count, z)
+        if significant_only and not row.significant:
+            continue
+        rows.append(row)
+
+    return heapq.nlargest(n, rows, key=lambda r: (abs(r.delta(sort)), r.endpoint))
+
+
+def _score(row: EndpointDiff, min_count: int, z: float) -> None:
+    a, b = row.before, row.after
+    if a.count == 0 or b.count == 0:
+        row.significant = max(a.count, b.count) >= min_count
+        return
+
+    var_a = a.std ** 2 if a.sq_total > 0 else a.avg ** 2
+    var_b = b.std ** 2 if b.sq_total > 0 else b.avg ** 2
+    se = math.sqrt(var_a / a.count + var_b / b.count)
+    row.avg_z = (b.avg - a.avg) / se if se > 0 else 0.0
+
+    se_q = math.sqrt(a.avg_q / a.count + b.avg_q / b.count)
+    row.avg_q_z = (b.avg_q - a.avg_q) / se_q if se_q > 0 else 0.0
+
+    row.significant = min(a.count, b.count) >= min_count and (
+        abs(row.avg_z) >= z or abs(row.avg_q_z) >= z
+    )
+
+
+def split_window(
+    window: RollingWindow, seconds: int | None = None, *, now: int | None = None
+) -> Tuple[Dict[str, EndpointStats], Dict[str, EndpointStats]]:
+    """
+    Return (previous interval, latest interval) aggregates of one window.
+
+    The latest interval covers the newest `seconds` of complete buckets
+    (default: half of them, rounded down to whole buckets); the previous
+    one is the equal-length interval right before it. The current bucket
+    is still filling up, so it is left out of both.
+    """
+    window.rotate_if_needed(now=now)
+    bs = window.bucket_seconds
+    complete = window.bucket_count - 1
+    buckets = (seconds // bs) if seconds else complete // 2
+    if buckets <= 0 or 2 * buckets > complete:
+        raise ValueError(
+            "split interval must cover at least one bucket and at most half the complete buckets"
+        )
+    edge = window.current_bucket_start - buckets * bs
+    return (
+        window.aggregate_between(edge - buckets * bs, edge, now=now),
+        window.aggregate_between(edge, window.current_bucket_start, now=now),
+    )
+
+
+def load_stats(path: str) -> Dict[str, EndpointStats]:
+    """
+    Read per-endpoint stats from a window dump, a worker export or a snapshot JSON.
+
+    Snapshots only contain their top rows: endpoints outside them show up
+    as new/gone in a diff, so prefer dumps or exports (or a large `n`).
+    """
+    with open(path, "rb") as fh:
+        data = fh.read()
+    if data[:len(MAGIC)] == MAGIC:
+        window = loads(data)
+        return window.aggregate(now=window.current_bucket_start)
+
+    payload = json.loads(data.decode("utf-8"))
+    if not isinstance(payload, dict):
+        raise ValueError("expected a JSON object")
+    if "endpoints" in payload:
+        endpoints = payload["endpoints"]
+        if not isinstance(endpoints, dict) or not all(isinstance(v, dict) for v in endpoints.values()):
+            raise ValueError("'endpoints' must map endpoint names to stats objects")
+        return {k: EndpointStats.from_dict(v) for k, v in endpoints.items()}
+    if "top" in payload:
+        top = payload["top"]
+        if not isinstance(top, list) or not all(isinstance(row, dict) and "endpoint" in row for row in top):
+            raise ValueError("'top' must be a list of rows with an 'endpoint' key")
+        return {row["endpoint"]: EndpointStats.from_dict(row) for row in top}
+    raise ValueError("no 'endpoints' or 'top' in JSON")
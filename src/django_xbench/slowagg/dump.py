@@ -0,0 +1,148 @@
+"""
+Compact binary dump of a full RollingWindow, for merging windows across hosts.
+
+Layout (little-endian):
+
+    header   magic "XBWD", u16 version, u32 bucket_seconds, u32 bucket_count,
+             u32 endpoint_cap, i64 current_bucket_start
+    body     zlib-compressed:
+             u16 field count, then per field: u8 name length, name, u8 type ("d"/"q")
+             u32 endpoint count, then per endpoint: u16 length, UTF-8 key
+             u32 bucket count, then per non-empty bucket: i64 bucket start,
+             u32 entry count, then per entry: u32 endpoint index + field values
+
+Endpoint keys are stored once and referenced by index. The field table
+makes dumps readable across versions: unknown fields are skipped, missing
+ones keep their defaults.
+"""
+from __future__ import annotations
+
+import struct
+import zlib
+from dataclasses import fields
+from typing import Dict, List, Tuple
+
+from .stats import EndpointStats
+from .window import RollingWindow
+
+
+MAGIC = b"XBWD"
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<4sHIIIq")
+_U8 = struct.Struct("<B")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_BUCKET = struct.Struct("<qI")
+
+_FIELDS: List[Tuple[str, str]] = [
+    (f.name, "d" if isinstance(f.default, float) else "q") for f in fields(EndpointStats)
+]
+
+
+def dumps(window: RollingWindow, *, now: int | None = None) -> bytes:
+    """Serialize every bucket of `window` (rotated to `now` first)."""
+    window.rotate_if_needed(now=now)
+    # update() accepts any number; "q" fields must be packed as ints.
+    kinds = [(name, float if code == "d" else int) for name, code in _FIELDS]
+    row = struct.Struct("<I" + "".join(code for _, code in _FIELDS))
+
+    interned: Dict[str, int] = {}
+    buckets = []
+    for start, bucket in window.iter_buckets():
+        # Copy items: request threads may add endpoints while we read.
+        entries = []
+        for key, st in list(bucket.iter_items()):
+            idx = interned.setdefault(key, len(interned))
+            entries.append(row.pack(idx, *(kind(getattr(st, name)) for name, kind in kinds)))
+        if entries:
+            buckets.append((start, entries))
+
+    body = [_U16.pack(len(_FIELDS))]
+    for name, code in _FIELDS:
+        raw = name.encode("ascii")
+        body.append(_U8.pack(len(raw)) + raw + code.encode("ascii"))
+    body.append(_U32.pack(len(interned)))
+    for key in interned:
+        raw = key.encode("utf-8")
+        body.append(_U16.pack(len(raw)) + raw)
+    body.append(_U32.pack(len(buckets)))
+    for start, entries in buckets:
+        body.append(_BUCKET.pack(start, len(entries)))
+        body.extend(entries)
+
+    header = _HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        window.bucket_seconds,
+        window.bucket_count,
+        window.endpoint_cap,
+        window.current_bucket_start,
+    )
+    return header + zlib.compress(b"".join(body))
+
+
+def loads(data: bytes) -> RollingWindow:
+    """Rebuild a RollingWindow from `dumps()` output. Raises ValueError on bad input."""
+    if len(data) < _HEADER.size:
+        raise ValueError("truncated window dump")
+    magic, version, bucket_seconds, bucket_count, endpoint_cap, current = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not a window dump")
+    if version > FORMAT_VERSION:
+        raise ValueError(f"unsupported window dump version {version}")
+    try:
+        body = zlib.decompress(data[_HEADER.size:])
+    except zlib.error as exc:
+        raise ValueError(f"corrupt window dump: {exc}") from None
+
+    window = RollingWindow(
+        bucket_seconds=bucket_seconds, bucket_count=bucket_count, endpoint_cap=endpoint_cap
+    )
+    window.reset(now=current)
+    try:
+        _read_body(window, body)
+    except (struct.error, IndexError, UnicodeDecodeError) as exc:
+        raise ValueError(f"corrupt window dump: {exc}") from None
+    return window
+
+
+def _read_body(window: RollingWindow, body: bytes) -> None:
+    known = {name for name, _ in _FIELDS}
+    pos = 0
+
+    (nfields,) = _U16.unpack_from(body, pos)
+    pos += _U16.size
+    names, codes = [], []
+    for _ in range(nfields):
+        (size,) = _U8.unpack_from(body, pos)
+        pos += _U8.size
+        names.append(body[pos:pos + size].decode("ascii"))
+        codes.append(body[pos + size:pos + size + 1].decode("ascii"))
+        pos += size + 1
+    if any(code not in ("d", "q") for code in codes):
+        raise ValueError("corrupt window dump: bad field type")
+    row = struct.Struct("<I" + "".join(codes))
+
+    (nkeys,) = _U32.unpack_from(body, pos)
+    pos += _U32.size
+    keys = []
+    for _ in range(nkeys):
+        (size,) = _U16.unpack_from(body, pos)
+        pos += _U16.size
+        keys.append(body[pos:pos + size].decode("utf-8"))
+        pos += size
+
+    (nbuckets,) = _U32.unpack_from(body, pos)
+    pos += _U32.size
+    for _ in range(nbuckets):
+        start, nentries = _BUCKET.unpack_from(body, pos)
+        pos += _BUCKET.size
+        bucket = window._bucket_at(start)
+        for _ in range(nentries):
+            idx, *values = row.unpack_from(body, pos)
+            pos += row.size
+            if bucket is None:
+                continue
+            st = EndpointStats(**{n: v for n, v in zip(names, values) if n in known})
+            bucket.merge(keys[idx], st)
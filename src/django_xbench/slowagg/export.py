@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Tuple
+
+from ..threads import PerProcessThread
+from .dump import dumps
+from .stats import RANK_KEYS, EndpointStats
+from .window import RollingWindow
+
+logger = logging.getLogger("django_xbench")
+
+FILE_PREFIX = "xbench-"
+FILE_SUFFIX = ".json"
+DUMP_SUFFIX = ".xbw"
+
+SORT_KEYS = RANK_KEYS
+
+
+class WindowExporter:
+    """
+    Periodically write this process's aggregated window to `directory`.
+
+    Each worker owns one file (`xbench-<pid>.json`) that is replaced
+    atomically, so readers such as `xbench_top` never see partial writes and
+    never touch the request path. Every `dump_interval` seconds (0: never)
+    the full window is also written as `xbench-<pid>.xbw` for `xbench_merge`. The writer runs in a daemon thread that is
+    started lazily per process (fork-safe). A final export at interpreter
+    exit marks the file `exited`, so short-lived processes (management
+    commands, cron jobs) still report; readers drop it after `max_age`.
+    """
+
+    def __init__(
+        self, window: RollingWindow, directory: str, *, interval: float = 1.0, dump_interval: float = 0.0
+    ) -> None:
+        self.window = window
+        self.directory = directory
+        self.interval = max(0.1, interval)
+        self.dump_interval = max(0.0, dump_interval)
+        self._thread = PerProcessThread(
+            self._run, "xbench-export", on_start=self._make_directory, at_exit=self._export_at_exit
+        )
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, f"{FILE_PREFIX}{os.getpid()}{FILE_SUFFIX}")
+
+    @property
+    def dump_path(self) -> str:
+        return os.path.join(self.directory, f"{FILE_PREFIX}{os.getpid()}{DUMP_SUFFIX}")
+
+    def ensure_running(self) -> None:
+        """Start the export thread for the current process if needed (cheap when running)."""
+        self._thread.ensure_running()
+
+    def _make_directory(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+
+    def export_once(self, *, exited: bool = False) -> str:
+        """Write the current aggregate and return the file path."""
+        now = int(time.time())
+        payload = {
+            "pid": os.getpid(),
+            "exported_at": now,
+            "exited": exited,
+            "window_seconds": self.window.window_seconds,
+            "bucket_seconds": self.window.bucket_seconds,
+            "bucket_count": self.window.bucket_count,
+            "endpoints": {k: st.to_dict() for k, st in self.window.aggregate(now=now).items()},
+        }
+        data = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return _write_atomic(self.path, data)
+
+    def dump_once(self) -> str:
+        """Write the full window as a binary dump and return the file path."""
+        return _write_atomic(self.dump_path, dumps(self.window))
+
+    def _run(self) -> None:
+        next_dump = time.monotonic() + self.dump_interval
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.export_once()
+                if self.dump_interval and time.monotonic() >= next_dump:
+                    next_dump = time.monotonic() + self.dump_interval
+                    self.dump_once()
+            except Exception:  # pragma: no cover - keep exporting on transient errors
+                logger.exception("[XBENCH] window export failed")
+
+    def _export_at_exit(self) -> None:
+        try:
+            if self.dump_interval:
+                self.dump_once()
+            self.export_once(exited=True)
+        except Exception:  # pragma: no cover - never fail interpreter shutdown
+            logger.exception("[XBENCH] final window export failed")
+
+
+class ExportReader:
+    """
+    Merge worker export files from a directory.
+
+    Parsed files are cached by (path, mtime), so polling every second only
+    re-reads files that actually changed. Files older than `max_age` are
+    skipped; those written by a process that has exited are also deleted.
+    """
+
+    def __init__(self, directory: str, *, max_age: float = 30.0) -> None:
+        self.directory = directory
+        self.max_age = max_age
+        self._cache: Dict[str, Tuple[float, dict]] = {}
+
+    def read(self) -> Tuple[Dict[str, EndpointStats], int]:
+        """Return (merged endpoint stats, number of reporting processes)."""
+        try:
+            names = [
+                n for n in os.listdir(self.directory)
+                if n.startswith(FILE_PREFIX) and n.endswith(FILE_SUFFIX)
+            ]
+        except OSError:
+            names = []
+
+        now = time.time()
+        merged: Dict[str, EndpointStats] = {}
+        live = 0
+        seen = set()
+        for name in names:
+            path = os.path.join(self.directory, name)
+            seen.add(path)
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                continue
+            cached = self._load(path, mtime)
+            if self.max_age > 0 and now - mtime > self.max_age:
+                # Finished processes are cleaned up; stuck or killed ones only skipped.
+                if cached is not None and cached[1].get("exited"):
+                    self._discard(path)
+                continue
+            if cached is None:
+                continue
+
+            live += 1
+            for key, data in cached[1].get("endpoints", {}).items():
+                merged.setdefault(key, EndpointStats()).merge_from(EndpointStats.from_dict(data))
+
+        for path in list(self._cache):
+            if path not in seen:
+                del self._cache[path]
+        return merged, live
+
+    def _load(self, path: str, mtime: float):
+        cached = self._cache.get(path)
+        if cached is None or cached[0] != mtime:
+            try:
+                with open(path, encoding="utf-8") as fh:
+                    cached = (mtime, json.load(fh))
+            except (OSError, ValueError):
+                return None
+            self._cache[path] = cached
+        return cached
+
+    def _discard(self, path: str) -> None:
+        self._cache.pop(path, None)
+        for name in (path, path[: -len(FILE_SUFFIX)] + DUMP_SUFFIX):
+            try:
+                os.remove(name)
+            except OSError:
+                pass
+
+
+def _write_atomic(path: str, data: bytes) -> str:
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+    return path
+
+
+def rank(merged: Dict[str, EndpointStats], n: int, sort: str = "damage") -> List[Dict[str, object]]:
+    """Return the top `n` rows (dicts with an "endpoint" key) ordered by `sort`, descending."""
+    if sort not in SORT_KEYS:
+        raise ValueError(f"unknown sort key: {sort}")
+    items = sorted(merged.items(), key=lambda kv: getattr(kv[1], sort), reverse=True)
+    return [{"endpoint": k, **st.to_dict()} for k, st in items[: max(0, n)]]
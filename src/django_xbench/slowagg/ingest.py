@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import csv
+import json
+from itertools import islice
+from typing import IO, Any, Dict, Iterable, Iterator, List
+
+from .window import Sample
+
+# Column / key names accepted in replay logs.
+FIELDS = ("timestamp", "endpoint", "duration_s", "db_s", "query_count")
+
+
+def _to_sample(row: Dict[str, Any]) -> Sample:
+    return (
+        float(row["timestamp"]),
+        str(row["endpoint"]),
+        float(row["duration_s"]),
+        float(row.get("db_s") or 0.0),
+        int(row.get("query_count") or 0),
+    )
+
+
+def iter_jsonl(fh: IO[str]) -> Iterator[Sample]:
+    """
+    Yield samples from a JSON Lines stream, one object per line.
+
+    Required keys: timestamp (epoch seconds), endpoint, duration_s.
+    Optional keys: db_s, query_count. Blank lines are skipped.
+    """
+    for lineno, line in enumerate(fh, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield _to_sample(json.loads(line))
+        except (KeyError, TypeError, ValueError) as exc:
+            raise ValueError(f"line {lineno}: {exc}") from None
+
+
+def iter_csv(fh: IO[str]) -> Iterator[Sample]:
+    """Yield samples from a CSV stream with a header row using the same column names."""
+    reader = csv.DictReader(fh)
+    for lineno, row in enumerate(reader, start=2):
+        try:
+            yield _to_sample(row)
+        except (KeyError, TypeError, ValueError) as exc:
+            raise ValueError(f"line {lineno}: {exc}") from None
+
+
+def batched(samples: Iterable[Sample], size: int) -> Iterator[List[Sample]]:
+    """Split an iterable into lists of at most `size` samples."""
+    it = iter(samples)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from typing import Dict, List
+
+
+def format_table(snap: Dict[str, object]) -> str:
+    """Render a snapshot's top rows as a plain-text table (same columns as the UI)."""
+    rows: List[Dict[str, object]] = snap["top"]  # type: ignore[assignment]
+    header = f"{'#':>3}  {'Count':>7}  {'Avg':>10}  {'Max':>10}  {'DB%':>6}  {'Avg Q':>6}  {'Damage':>10}  Endpoint"
+    lines = [header, "-" * len(header)]
+    for i, r in enumerate(rows, start=1):
+        lines.append(
+            f"{i:>3}  {r['count']:>7}  "
+            f"{r['avg'] * 1000:>7.2f} ms  {r['max'] * 1000:>7.2f} ms  "
+            f"{r['db_ratio'] * 100:>5.1f}%  {r['avg_q']:>6.1f}  "
+            f"{r['damage']:>8.3f} s  {r['endpoint']}"
+        )
+    if not rows:
+        lines.append("No data yet")
+    return "\n".join(lines)
@@ -1,8 +1,28 @@
 from __future__ import annotations
 
-from typing import Dict, Any
+import math
+from dataclasses import fields
+from typing import Dict, Any, Optional
 from .compat import dataclass_slots
 
+# EndpointStats attributes that snapshots and reports may rank by (descending).
+RANK_KEYS = (
+    "damage", "avg", "max", "db_ratio", "avg_q", "count", "cpu_total", "avg_cpu", "gc_total",
+    "mem_damage", "alloc_peak_max", "rss_growth_total", "queue_total", "avg_queue",
+    "connect_total", "commit_total", "bytes_total", "avg_bytes",
+)
+
+# Derived values added by `to_dict()` after the stored fields.
+DERIVED_KEYS = (
+    "std", "avg", "db_ratio", "avg_q", "avg_overhead", "avg_cpu", "cpu_ratio", "avg_gc",
+    "avg_rss_growth", "avg_alloc_peak", "mem_damage", "avg_queue", "avg_bytes",
+    "app_throughput", "avg_ttfb", "damage",
+)
+
+# Stored fields merged by maximum instead of by sum.
+MAX_FIELDS = ("max", "alloc_peak_max", "queue_max")
+
+
 @dataclass_slots()
 class EndpointStats:
     """
@@ -16,9 +36,39 @@ class EndpointStats:
 
     count: int = 0
     total: float = 0.0
+    # Sum of squared durations, for variance (see `std`).
+    sq_total: float = 0.0
     max: float = 0.0
     db_total: float = 0.0
     query_total: int = 0
+    overhead_total: float = 0.0
+    cpu_total: float = 0.0
+    gc_total: float = 0.0
+    gc_count: int = 0
+    gc_gen2_count: int = 0
+    # Memory mode only: RSS growth on every measured request, allocation
+    # peaks on the tracemalloc-sampled subset (bytes).
+    rss_count: int = 0
+    rss_growth_total: int = 0
+    mem_samples: int = 0
+    alloc_peak_total: int = 0
+    alloc_peak_max: int = 0
+    # Requests that carried a proxy request-start header.
+    queue_count: int = 0
+    queue_total: float = 0.0
+    queue_max: float = 0.0
+    # Connection setup and transaction end, summed over DB aliases.
+    connect_count: int = 0
+    connect_total: float = 0.0
+    commit_count: int = 0
+    commit_total: float = 0.0
+    rollback_count: int = 0
+    rollback_total: float = 0.0
+    bytes_total: int = 0
+    # Streaming responses only (ttfb/stream_db are measured during body iteration).
+    stream_count: int = 0
+    ttfb_total: float = 0.0
+    stream_db_total: float = 0.0
 
     def update(
         self,
@@ -26,6 +76,23 @@ class EndpointStats:
         duration_s: float,
         db_s: float = 0.0,
         query_count: int = 0,
+        overhead_s: float = 0.0,
+        cpu_s: float = 0.0,
+        gc_s: float = 0.0,
+        gc_count: int = 0,
+        gc_gen2_count: int = 0,
+        rss_delta: Optional[int] = None,
+        alloc_peak: Optional[int] = None,
+        queue_s: Optional[float] = None,
+        connect_s: float = 0.0,
+        connect_count: int = 0,
+        commit_s: float = 0.0,
+        commit_count: int = 0,
+        rollback_s: float = 0.0,
+        rollback_count: int = 0,
+        bytes_sent: int = 0,
+        ttfb_s: Optional[float] = None,
+        stream_db_s: float = 0.0,
         n: int = 1,
     ) -> None:
         """
@@ -41,6 +108,36 @@ class EndpointStats:
             Database time in seconds.
         query_count, optional
             Number of database queries executed.
+        overhead_s, optional
+            Time spent in xbench's own instrumentation, in seconds.
+        cpu_s, optional
+            CPU time consumed by the request thread in seconds.
+        gc_s, optional
+            Garbage-collector pause time during the request in seconds.
+        gc_count, gc_gen2_count, optional
+            Number of collections (all generations / generation 2 only).
+        rss_delta, optional
+            Change in process RSS during the request (bytes); None if not
+            measured. Shrinkage counts as zero growth.
+        alloc_peak, optional
+            Peak Python allocation during the request from tracemalloc
+            (bytes); None if the request was not sampled.
+        queue_s, optional
+            Time spent queued upstream (proxy / server backlog) before
+            Django saw the request; None if unknown.
+        connect_s, connect_count, optional
+            Time spent opening DB connections (including session setup
+            statements, which are not counted in `db_s`) and how many.
+        commit_s, commit_count, rollback_s, rollback_count, optional
+            Time spent in transaction commit / rollback calls and how many.
+        bytes_sent, optional
+            Response body size in bytes.
+        ttfb_s, optional
+            Time to first body byte for streaming responses; None otherwise.
+            For streaming responses `duration_s` is the time to last byte.
+        stream_db_s, optional
+            Database time spent while the streaming body was iterated
+            (already included in `db_s`).
         n, optional
             Number of identical samples to add (default 1).
         """
@@ -53,11 +150,54 @@ class EndpointStats:
             db_s = 0.0
         if query_count < 0:
             query_count = 0
+        if overhead_s < 0:
+            overhead_s = 0.0
+        if cpu_s < 0:
+            cpu_s = 0.0
+        if gc_s < 0:
+            gc_s = 0.0
+        if bytes_sent < 0:
+            bytes_sent = 0
 
         self.count += n
         self.total += duration_s * n
+        self.sq_total += duration_s * duration_s * n
         self.db_total += db_s * n
         self.query_total += query_count * n
+        self.overhead_total += overhead_s * n
+        self.cpu_total += cpu_s * n
+        self.gc_total += gc_s * n
+        self.gc_count += max(0, gc_count) * n
+        self.gc_gen2_count += max(0, gc_gen2_count) * n
+
+        if rss_delta is not None:
+            self.rss_count += n
+            self.rss_growth_total += max(0, rss_delta) * n
+        if alloc_peak is not None:
+            alloc_peak = max(0, alloc_peak)
+            self.mem_samples += n
+            self.alloc_peak_total += alloc_peak * n
+            if alloc_peak > self.alloc_peak_max:
+                self.alloc_peak_max = alloc_peak
+        if queue_s is not None:
+            queue_s = max(0.0, queue_s)
+            self.queue_count += n
+            self.queue_total += queue_s * n
+            if queue_s > self.queue_max:
+                self.queue_max = queue_s
+
+        self.connect_total += max(0.0, connect_s) * n
+        self.connect_count += max(0, connect_count) * n
+        self.commit_total += max(0.0, commit_s) * n
+        self.commit_count += max(0, commit_count) * n
+        self.rollback_total += max(0.0, rollback_s) * n
+        self.rollback_count += max(0, rollback_count) * n
+        self.bytes_total += bytes_sent * n
+
+        if ttfb_s is not None:
+            self.stream_count += n
+            self.ttfb_total += max(0.0, ttfb_s) * n
+            self.stream_db_total += max(0.0, stream_db_s) * n
 
         if duration_s > self.max:
             self.max = duration_s
@@ -71,19 +211,26 @@ class EndpointStats:
         if other.count <= 0:
             return
 
-        self.count += other.count
-        self.total += other.total
-        self.db_total += other.db_total
-        self.query_total += other.query_total
-
-        if other.max > self.max:
-            self.max = other.max
+        for name in _SUM_FIELDS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for name in MAX_FIELDS:
+            value = getattr(other, name)
+            if value > getattr(self, name):
+                setattr(self, name, value)
 
     @property
     def avg(self) -> float:
         """Average request duration in seconds."""
         return self.total / self.count if self.count else 0.0
 
+    @property
+    def std(self) -> float:
+        """Sample standard deviation of request duration in seconds (0 if unknown)."""
+        if self.count < 2:
+            return 0.0
+        var = (self.sq_total - self.total * self.total / self.count) / (self.count - 1)
+        return math.sqrt(var) if var > 0 else 0.0
+
     @property
     def db_ratio(self) -> float:
         """Ratio of database time to total time (0–1)."""
@@ -94,35 +241,103 @@ class EndpointStats:
         """Average number of queries per request."""
         return self.query_total / self.count if self.count else 0.0
 
+    @property
+    def avg_overhead(self) -> float:
+        """Average xbench instrumentation overhead per request in seconds."""
+        return self.overhead_total / self.count if self.count else 0.0
+
+    @property
+    def avg_cpu(self) -> float:
+        """Average CPU time per request in seconds."""
+        return self.cpu_total / self.count if self.count else 0.0
+
+    @property
+    def cpu_ratio(self) -> float:
+        """Ratio of CPU time to total time (0–1); the rest is DB or other waiting."""
+        return (self.cpu_total / self.total) if self.total > 0 else 0.0
+
+    @property
+    def avg_gc(self) -> float:
+        """Average GC pause time per request in seconds."""
+        return self.gc_total / self.count if self.count else 0.0
+
+    @property
+    def avg_alloc_peak(self) -> float:
+        """Average allocation peak (bytes) over tracemalloc-sampled requests."""
+        return self.alloc_peak_total / self.mem_samples if self.mem_samples else 0.0
+
+    @property
+    def avg_rss_growth(self) -> float:
+        """Average RSS growth (bytes) over requests measured in memory mode."""
+        return self.rss_growth_total / self.rss_count if self.rss_count else 0.0
+
+    @property
+    def mem_damage(self) -> float:
+        """
+        Estimated memory pressure in bytes (count × avg allocation peak).
+
+        Falls back to total RSS growth when no request was sampled.
+        """
+        if self.mem_samples:
+            return self.avg_alloc_peak * self.count
+        return float(self.rss_growth_total)
+
+    @property
+    def avg_queue(self) -> float:
+        """Average upstream queue time in seconds (requests with a start header only)."""
+        return self.queue_total / self.queue_count if self.queue_count else 0.0
+
+    @property
+    def avg_bytes(self) -> float:
+        """Average response body size in bytes."""
+        return self.bytes_total / self.count if self.count else 0.0
+
+    @property
+    def app_throughput(self) -> float:
+        """
+        Response bytes per second of non-DB time (serialization throughput).
+
+        A low value on a large payload means building the body, not the
+        database, dominates the endpoint.
+        """
+        app_total = self.total - self.db_total
+        return self.bytes_total / app_total if app_total > 0 else 0.0
+
+    @property
+    def avg_ttfb(self) -> float:
+        """Average time to first byte of streaming responses in seconds."""
+        return self.ttfb_total / self.stream_count if self.stream_count else 0.0
+
     @property
     def damage(self) -> float:
         """Total accumulated latency (count × avg)."""
         return self.total
 
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "EndpointStats":
+        """
+        Rebuild stats from `to_dict()` output (derived keys are ignored).
+
+        Missing keys default to zero, so older exports remain readable.
+        """
+        return cls(**{name: kind(data.get(name, 0)) for name, kind in _FIELD_TYPES})
+
     def to_dict(self) -> Dict[str, Any]:
         """
         Return metrics as a dictionary.
 
-        Keys
-        ----
-        count : int
-        total : float
-        avg : float
-        max : float
-        db_total : float
-        db_ratio : float
-        query_total : int
-        avg_q : float
-        damage : float
+        Every stored field (ints for counts and byte sums, floats for
+        seconds), followed by the derived values in `DERIVED_KEYS`.
         """
-        return {
-            "count": self.count,
-            "total": self.total,
-            "avg": self.avg,
-            "max": self.max,
-            "db_total": self.db_total,
-            "db_ratio": self.db_ratio,
-            "query_total": self.query_total,
-            "avg_q": self.avg_q,
-            "damage": self.damage,
-        }
+        row: Dict[str, Any] = {name: getattr(self, name) for name, _ in _FIELD_TYPES}
+        for name in DERIVED_KEYS:
+            row[name] = getattr(self, name)
+        return row
+
+
+_FIELD_TYPES = tuple(
+    (f.name, float if isinstance(f.default, float) else int) for f in fields(EndpointStats)
+)
+
+
+_SUM_FIELDS = tuple(name for name, _ in _FIELD_TYPES if name not in MAX_FIELDS)
@@ -1,9 +1,13 @@
-from django.http import JsonResponse, HttpResponseForbidden, HttpResponse
+import json
+
+from django.http import HttpResponseForbidden, HttpResponse
 from django.conf import settings
-from django.views.decorators.http import require_GET
+from django.core.serializers.json import DjangoJSONEncoder
+from django.views.decorators.http import condition, require_GET
 from html import escape
 
-from . import WINDOW
+from . import SNAPSHOT_CACHE
+from .stats import RANK_KEYS
 
 
 def _is_allowed(request):
@@ -22,44 +26,85 @@ def _is_allowed(request):
     return bool(user and user.is_authenticated and (user.is_staff or user.is_superuser))
 
 
+def _parse_n(request):
+    try:
+        n = int(request.GET.get("n", "20"))
+    except ValueError:
+        n = 20
+    return max(1, min(n, 200))
+
+
+def _parse_sort(request):
+    sort = request.GET.get("sort", "damage")
+    return sort if sort in RANK_KEYS else "damage"
+
+
+def _get_entry(request):
+    # Fetched once per request: the ETag and the body must come from the same entry,
+    # even if the cache TTL expires between `etag_func` and the view.
+    entry = getattr(request, "_xbench_snapshot_entry", None)
+    if entry is None:
+        entry = SNAPSHOT_CACHE.get(_parse_n(request), sort=_parse_sort(request))
+        request._xbench_snapshot_entry = entry
+    return entry
+
+
+def _snapshot_etag(request):
+    # Access is checked again in the view; never leak a validator to denied callers.
+    if not _is_allowed(request):
+        return None
+    return _get_entry(request).etag
+
+
+def _ui_etag(request):
+    etag = _snapshot_etag(request)
+    return f"ui-{etag}" if etag else None
+
+
 @require_GET
+@condition(etag_func=_snapshot_etag)
 def slowagg_snapshot(request):
     """
     Return a JSON snapshot of the rolling slow-endpoint aggregation.
 
     Usage:
       GET /__xbench__/slow/?n=20
+      GET /__xbench__/slow/?n=20&sort=cpu_total
 
     Notes:
       - Results are collected in-memory per process.
+      - Snapshots are memoized briefly (see `SLOW_CACHE_TTL`) and carry an
+        ETag; a matching `If-None-Match` yields 304 Not Modified.
       - Do not expose publicly without authentication.
     """
     if not _is_allowed(request):
         return HttpResponseForbidden("xbench slow aggregation access denied")
 
-    try:
-        n = int(request.GET.get("n", "20"))
-    except ValueError:
-        n = 20
-    n = max(1, min(n, 200))
-
-    return JsonResponse(WINDOW.snapshot(n=n), json_dumps_params={"ensure_ascii": False})
-
+    entry = _get_entry(request)
+    body = entry.rendered.get("json")
+    if body is None:
+        body = json.dumps(entry.snapshot, cls=DjangoJSONEncoder, ensure_ascii=False)
+        entry.rendered["json"] = body
 
+    return HttpResponse(body, content_type="application/json")
 
 
 @require_GET
+@condition(etag_func=_ui_etag)
 def slowagg_ui(request):
     if not _is_allowed(request):
         return HttpResponseForbidden("xbench slow aggregation access denied")
 
-    try:
-        n = int(request.GET.get("n", "20"))
-    except ValueError:
-        n = 20
-    n = max(1, min(n, 200))
+    entry = _get_entry(request)
+    html = entry.rendered.get("html")
+    if html is None:
+        html = _render_ui(entry.snapshot, _parse_n(request))
+        entry.rendered["html"] = html
+
+    return HttpResponse(html)
 
-    snap = WINDOW.snapshot(n=n)
+
+def _render_ui(snap, n):
     rows = snap["top"]
 
     html_rows = []
@@ -74,12 +119,13 @@ def slowagg_ui(request):
             f"<td class='num'>{r['max']*1000:.2f} ms</td>"
             f"<td class='num'>{r['db_ratio']*100:.1f}%</td>"
             f"<td class='num'>{r['avg_q']:.1f}</td>"
+            f"<td class='num'>{r['avg_cpu']*1000:.2f} ms</td>"
             f"<td class='num'>{r['damage']:.3f} s</td>"
             "</tr>"
         )
 
 
-    body = "\n".join(html_rows) if html_rows else "<tr><td colspan='8'>No data yet</td></tr>"
+    body = "\n".join(html_rows) if html_rows else "<tr><td colspan='9'>No data yet</td></tr>"
 
     style = """
     <style>
@@ -92,7 +138,7 @@ def slowagg_ui(request):
     thead th { background: #fafafa; font-weight: 700; }
 
     th.rank, td.rank { width: 56px; text-align: right; }
-    th.endpoint, td.endpoint { width: 44%; text-align: left; }
+    th.endpoint, td.endpoint { width: 36%; text-align: left; }
     th.num, td.num { text-align: right; font-variant-numeric: tabular-nums; }
 
     td.endpoint { overflow: hidden; text-overflow: ellipsis; white-space: nowrap; }
@@ -101,7 +147,7 @@ def slowagg_ui(request):
     </style>
     """.strip()
 
-    html = (
+    return (
         "<!doctype html>\n"
         "<html>\n"
         "<head>\n"
@@ -110,7 +156,7 @@ def slowagg_ui(request):
         f"  {style}\n"
         "</head>\n"
         "<body>\n"
-        f"  <h1>Slow Endpoints (Top {n})</h1>\n"
+        f"  <h1>Slow Endpoints (Top {n} by {escape(str(snap['sort']))})</h1>\n"
         "  <div class='meta'>\n"
         f"    window={snap['window_seconds']}s, bucket={snap['bucket_seconds']}s × {snap['bucket_count']} | "
         f"generated_at={snap['generated_at']}\n"
@@ -119,12 +165,13 @@ def slowagg_ui(request):
         "  <table>\n"
         "    <colgroup>\n"
         "      <col style='width:56px'>\n"
-        "      <col style='width:44%'>\n"
+        "      <col style='width:36%'>\n"
         "      <col style='width:10%'>\n"
         "      <col style='width:12%'>\n"
         "      <col style='width:12%'>\n"
         "      <col style='width:8%'>\n"
         "      <col style='width:8%'>\n"
+        "      <col style='width:8%'>\n"
         "      <col style='width:10%'>\n"
         "    </colgroup>\n"
         "    <thead>\n"
@@ -136,6 +183,7 @@ def slowagg_ui(request):
         "        <th class='num'>Max</th>\n"
         "        <th class='num'>DB%</th>\n"
         "        <th class='num'>Avg Q</th>\n"
+        "        <th class='num'>Avg CPU</th>\n"
         "        <th class='num'>Damage</th>\n"
         "      </tr>\n"
         "    </thead>\n"
@@ -146,5 +194,3 @@ def slowagg_ui(request):
         "</body>\n"
         "</html>\n"
     )
-
-    return HttpResponse(html)
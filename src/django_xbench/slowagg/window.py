@@ -1,11 +1,15 @@
 from __future__ import annotations
 
+import threading
 import time
 from dataclasses import field
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 from .compat import dataclass_slots
 from .bucket import Bucket, DEFAULT_ENDPOINT_CAP
-from .stats import EndpointStats
+from .stats import RANK_KEYS, EndpointStats
+
+# (timestamp, endpoint_key, duration_s, db_s, query_count)
+Sample = Tuple[float, str, float, float, int]
 
 
 @dataclass_slots()
@@ -15,6 +19,9 @@ class RollingWindow:
 
     Invariant:
         window_seconds == bucket_seconds * bucket_count
+
+    Rotation happens under a lock: request threads and background readers
+    (exporters, snapshot polls) may all advance the window concurrently.
     """
 
     bucket_seconds: int = 10
@@ -26,6 +33,9 @@ class RollingWindow:
 
     _current_idx: int = field(default=0, init=False)
     _current_bucket_start: int = field(default=0, init=False)
+    _rotate_lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False, compare=False
+    )
 
     def __post_init__(self) -> None:
         if self.bucket_seconds <= 0:
@@ -40,24 +50,78 @@ class RollingWindow:
         self._current_bucket_start = self._align_to_bucket(now)
         self._current_idx = 0
 
-    def update(
-        self,
-        endpoint_key: str,
-        *,
-        duration_s: float,
-        db_s: float = 0.0,
-        query_count: int = 0,
-        now: int | None = None,
-        n: int = 1,
-    ) -> None:
+    def update(self, endpoint_key: str, *, now: int | None = None, **fields) -> None:
+        """Rotate to `now`, then add one sample; `fields` as for `EndpointStats.update()`."""
         self.rotate_if_needed(now=now)
-        self.buckets[self._current_idx].update(
-            endpoint_key,
-            duration_s=duration_s,
-            db_s=db_s,
-            query_count=query_count,
-            n=n,
-        )
+        self.buckets[self._current_idx].update(endpoint_key, **fields)
+
+    def update_many(self, samples: Iterable[Sample]) -> int:
+        """
+        Apply a batch of timestamped samples.
+
+        Samples are partitioned by bucket and pre-aggregated per endpoint, so
+        rotation, endpoint-cap resolution and bucket lookups happen once per
+        (bucket, endpoint) instead of once per sample. Input order does not
+        matter. Samples older than the window are dropped; samples newer than
+        the current bucket advance the window like `update(now=...)`.
+
+        Returns the number of samples that landed in the window.
+        """
+        bs = self.bucket_seconds
+        groups: Dict[int, Dict[str, EndpointStats]] = {}
+        for ts, endpoint_key, duration_s, db_s, query_count in samples:
+            ts = int(ts)
+            start = ts - (ts % bs)
+            per_endpoint = groups.get(start)
+            if per_endpoint is None:
+                per_endpoint = groups[start] = {}
+            st = per_endpoint.get(endpoint_key)
+            if st is None:
+                st = per_endpoint[endpoint_key] = EndpointStats()
+            st.update(duration_s=duration_s, db_s=db_s, query_count=query_count)
+
+        if not groups:
+            return 0
+
+        # Advance once to the newest bucket, then place older groups directly.
+        self.rotate_if_needed(now=max(groups))
+        applied = 0
+        for start in groups:
+            bucket = self._bucket_at(start)
+            if bucket is None:
+                continue
+            for endpoint_key, st in groups[start].items():
+                bucket.merge(endpoint_key, st)
+                applied += st.count
+        return applied
+
+    def update_columns(
+        self,
+        timestamps: Sequence[float],
+        endpoints: Sequence[str],
+        durations: Sequence[float],
+        db: Optional[Sequence[float]] = None,
+        queries: Optional[Sequence[int]] = None,
+    ) -> int:
+        """Columnar variant of `update_many()`; all columns must have equal length."""
+        size = len(timestamps)
+        if db is None:
+            db = [0.0] * size
+        if queries is None:
+            queries = [0] * size
+        if not (len(endpoints) == len(durations) == len(db) == len(queries) == size):
+            raise ValueError("all columns must have the same length")
+        return self.update_many(zip(timestamps, endpoints, durations, db, queries))
+
+    def reset(self, *, now: int | None = None) -> None:
+        """Clear all buckets and restart the window at `now` (e.g. for log replay)."""
+        if now is None:
+            now = int(time.time())
+        with self._rotate_lock:
+            for b in self.buckets:
+                b.clear()
+            self._current_idx = 0
+            self._current_bucket_start = self._align_to_bucket(int(now))
 
     def rotate_if_needed(self, *, now: int | None = None) -> None:
         if now is None:
@@ -65,51 +129,135 @@ class RollingWindow:
 
         aligned = self._align_to_bucket(now)
         if aligned <= self._current_bucket_start:
-            return
+            return  # fast path, no lock: nothing to rotate
 
-        steps = (aligned - self._current_bucket_start) // self.bucket_seconds
-        if steps <= 0:
-            return
+        with self._rotate_lock:
+            # Re-read under the lock: another thread may have rotated already.
+            steps = (aligned - self._current_bucket_start) // self.bucket_seconds
+            if steps <= 0:
+                return
+
+            # If time jumped beyond the full window, clear everything.
+            if steps >= self.bucket_count:
+                for b in self.buckets:
+                    b.clear()
+                self._current_idx = 0
+                self._current_bucket_start = aligned
+                return
+
+            # Advance step-by-step: move index, clear the new current bucket.
+            for _ in range(steps):
+                self._current_idx = (self._current_idx + 1) % self.bucket_count
+                self.buckets[self._current_idx].clear()
 
-        # If time jumped beyond the full window, clear everything.
-        if steps >= self.bucket_count:
-            for b in self.buckets:
-                b.clear()
-            self._current_idx = 0
             self._current_bucket_start = aligned
-            return
 
-        # Advance step-by-step: move index, clear the new current bucket.
-        for _ in range(steps):
-            self._current_idx = (self._current_idx + 1) % self.bucket_count
-            self.buckets[self._current_idx].clear()
+    def iter_buckets(self) -> Iterable[Tuple[int, Bucket]]:
+        """Yield (bucket_start, bucket) pairs, oldest first."""
+        for steps in range(self.bucket_count - 1, -1, -1):
+            idx = (self._current_idx - steps) % self.bucket_count
+            yield self._current_bucket_start - steps * self.bucket_seconds, self.buckets[idx]
+
+    def merge_from(self, other: RollingWindow) -> int:
+        """
+        Fold another window (e.g. another host's dump) into this one, bucket by bucket.
 
-        self._current_bucket_start = aligned
+        Both windows must use the same `bucket_seconds`. This window first
+        advances to the newer of the two current buckets; buckets of `other`
+        that fall outside this window are dropped. Endpoint caps of this
+        window apply. Returns the number of requests merged.
+        """
+        if other.bucket_seconds != self.bucket_seconds:
+            raise ValueError(
+                f"bucket_seconds mismatch: {other.bucket_seconds} != {self.bucket_seconds}"
+            )
+        self.rotate_if_needed(now=other.current_bucket_start)
+        merged = 0
+        for start, src in other.iter_buckets():
+            dst = self._bucket_at(start)
+            if dst is None:
+                continue
+            for endpoint_key, st in list(src.iter_items()):
+                dst.merge(endpoint_key, st)
+                merged += st.count
+        return merged
 
     def aggregate(self, *, now: int | None = None) -> Dict[str, EndpointStats]:
         self.rotate_if_needed(now=now)
         merged: Dict[str, EndpointStats] = {}
         for b in self.buckets:
-            for key, st in b.iter_items():
+            # Copy items: request threads may add endpoints while we read.
+            for key, st in list(b.iter_items()):
                 merged.setdefault(key, EndpointStats()).merge_from(st)
         return merged
 
-    def top_n(self, n: int = 20, *, now: int | None = None) -> List[Tuple[str, EndpointStats]]:
-        if n <= 0:
-            return []
-        items = list(self.aggregate(now=now).items())
-        items.sort(key=lambda kv: kv[1].damage, reverse=True)
-        return items[:n]
+    def aggregate_between(
+        self, since: int, until: int, *, now: int | None = None
+    ) -> Dict[str, EndpointStats]:
+        """Merge only the buckets starting in [since, until) (epoch seconds)."""
+        self.rotate_if_needed(now=now)
+        merged: Dict[str, EndpointStats] = {}
+        for start, b in self.iter_buckets():
+            if since <= start < until:
+                for key, st in list(b.iter_items()):
+                    merged.setdefault(key, EndpointStats()).merge_from(st)
+        return merged
+
+    def top_n(
+        self, n: int = 20, *, now: int | None = None, sort: str = "damage"
+    ) -> List[Tuple[str, EndpointStats]]:
+        return self._rank(self.aggregate(now=now), n, sort)
 
-    def snapshot(self, n: int = 20, *, now: int | None = None) -> Dict[str, object]:
-        top = self.top_n(n=n, now=now)
+    def snapshot(
+        self, n: int = 20, *, now: int | None = None, sort: str = "damage"
+    ) -> Dict[str, object]:
+        merged = self.aggregate(now=now)
+        top = self._rank(merged, n, sort)
         return {
             "window_seconds": self.window_seconds,
             "bucket_seconds": self.bucket_seconds,
             "bucket_count": self.bucket_count,
             "generated_at": int(time.time()) if now is None else now,
+            "sort": sort,
+            "queue": self._queue_summary(merged),
             "top": [{"endpoint": k, **st.to_dict()} for k, st in top],
         }
 
+    @staticmethod
+    def _rank(
+        merged: Dict[str, EndpointStats], n: int, sort: str
+    ) -> List[Tuple[str, EndpointStats]]:
+        if sort not in RANK_KEYS:
+            raise ValueError(f"unknown sort key: {sort}")
+        if n <= 0:
+            return []
+        items = list(merged.items())
+        items.sort(key=lambda kv: getattr(kv[1], sort), reverse=True)
+        return items[:n]
+
+    @staticmethod
+    def _queue_summary(merged: Dict[str, EndpointStats]) -> Dict[str, float]:
+        """Window-wide upstream queue time across all endpoints (not just the top N)."""
+        count = sum(st.queue_count for st in merged.values())
+        total = sum(st.queue_total for st in merged.values())
+        return {
+            "count": count,
+            "total": total,
+            "avg": total / count if count else 0.0,
+            "max": max((st.queue_max for st in merged.values()), default=0.0),
+        }
+
+    @property
+    def current_bucket_start(self) -> int:
+        """Epoch second at which the current (newest) bucket starts."""
+        return self._current_bucket_start
+
+    def _bucket_at(self, bucket_start: int) -> Bucket | None:
+        """Return the bucket covering `bucket_start`, or None if outside the window."""
+        steps = (self._current_bucket_start - bucket_start) // self.bucket_seconds
+        if steps < 0 or steps >= self.bucket_count:
+            return None
+        return self.buckets[(self._current_idx - steps) % self.bucket_count]
+
     def _align_to_bucket(self, ts: int) -> int:
         return ts - (ts % self.bucket_seconds)
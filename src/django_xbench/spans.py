@@ -0,0 +1,321 @@
+"""
+Optional export of per-request measurements as OpenTelemetry (OTLP/JSON) spans.
+
+Enabled with `XBENCH["SPAN_EXPORT"]`. The request path only builds a small
+SpanRecord and offers it to a bounded queue (never blocking; full queue means
+the record is dropped and counted). A daemon thread converts batches to
+OTLP/JSON `ExportTraceServiceRequest` payloads and appends them to a file
+(one payload per line) or POSTs them to an OTLP/HTTP endpoint.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import urllib.request
+from typing import Dict, List, Optional, Tuple
+
+from . import __version__
+from .conf import (
+    XBENCH_SPAN_BATCH_SIZE,
+    XBENCH_SPAN_EXPORT,
+    XBENCH_SPAN_FLUSH_INTERVAL,
+    XBENCH_SPAN_MAX_QUERIES,
+    XBENCH_SPAN_QUEUE_SIZE,
+    XBENCH_SPAN_SERVICE_NAME,
+)
+from .slowagg.compat import dataclass_slots
+from .threads import PerProcessThread
+
+logger = logging.getLogger("django_xbench")
+
+# OTLP SpanKind values.
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+
+# OTLP status codes.
+_STATUS_ERROR = 2
+
+_TRACEPARENT = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+_MAX_STATEMENT = 2048
+
+
+def parse_traceparent(value: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """Return (trace_id, parent_span_id) from a W3C `traceparent` header, or (None, None)."""
+    if not value:
+        return None, None
+    m = _TRACEPARENT.match(value.strip().lower())
+    if m is None or m.group(1) == "0" * 32 or m.group(2) == "0" * 16:
+        return None, None
+    return m.group(1), m.group(2)
+
+
+@dataclass_slots()
+class SpanRecord:
+    """
+    Raw measurements of one request or task, converted to spans off the request path.
+
+    `start_ns` is wall-clock (epoch nanoseconds) and `perf_start` the matching
+    `perf_counter()` reading; query starts in `queries` are `perf_counter()`
+    values and are placed relative to it.
+    """
+
+    name: str
+    kind: int
+    start_ns: int
+    perf_start: float
+    duration_s: float
+    attributes: Dict[str, object]
+    queries: List[Tuple[float, float, str, str, str]]
+    trace_id: Optional[str] = None
+    parent_span_id: Optional[str] = None
+    error: bool = False
+
+
+class SpanExporter:
+    """
+    Bounded, non-blocking span queue with a background flush thread.
+
+    `target` is a file path or an http(s):// OTLP/HTTP JSON endpoint. The
+    thread flushes every `interval` seconds, or as soon as a full batch is
+    waiting. Counters (see `stats()`): `dropped` (queue full), `exported` and
+    `failed` (records lost to write or HTTP errors). The thread starts
+    lazily per process (fork-safe) on the first `submit()`.
+    """
+
+    def __init__(
+        self,
+        target: str,
+        *,
+        service_name: str = "django",
+        queue_size: int = 2048,
+        batch_size: int = 256,
+        interval: float = 1.0,
+        timeout: float = 5.0,
+    ) -> None:
+        self.target = target
+        self.service_name = service_name
+        self.batch_size = max(1, batch_size)
+        self.interval = max(0.01, interval)
+        self.timeout = timeout
+        self.dropped = 0
+        self.exported = 0
+        self.failed = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self._lock = threading.Lock()
+        # Serializes flushes between the background thread and callers.
+        self._export_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = PerProcessThread(
+            self._run, "xbench-spans", on_start=self._fresh_queue, at_exit=self.flush
+        )
+
+    def submit(self, record: SpanRecord) -> bool:
+        """Offer a record for export; returns False (and counts a drop) if the queue is full."""
+        self.ensure_running()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def ensure_running(self) -> None:
+        """Start the flush thread for the current process if needed (cheap when running)."""
+        self._thread.ensure_running()
+
+    def _fresh_queue(self) -> None:
+        # One queue per process: after a fork the parent's records are not ours to send.
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "dropped": self.dropped,
+            "exported": self.exported,
+            "failed": self.failed,
+            "pending": self._queue.qsize(),
+        }
+
+    def flush(self) -> None:
+        """Export everything queued so far (blocking; not for the request path)."""
+        with self._export_lock:
+            while True:
+                batch = self._take()
+                if not batch:
+                    return
+                self._export(batch)
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:  # pragma: no cover - keep the thread alive
+                logger.exception("[XBENCH] span flush failed")
+
+    def _take(self) -> List[SpanRecord]:
+        batch: List[SpanRecord] = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _export(self, batch: List[SpanRecord]) -> None:
+        body = json.dumps(self.to_otlp(batch), separators=(",", ":")).encode("utf-8")
+        try:
+            if self.target.startswith(("http://", "https://")):
+                req = urllib.request.Request(
+                    self.target, data=body, headers={"Content-Type": "application/json"}
+                )
+                with urllib.request.urlopen(req, timeout=self.timeout) as res:
+                    res.read()
+            else:
+                with open(self.target, "ab") as fh:
+                    fh.write(body + b"\n")
+        except Exception as exc:
+            self.failed += len(batch)
+            logger.warning("[XBENCH] span export to %s failed: %s", self.target, exc)
+            return
+        self.exported += len(batch)
+
+    def to_otlp(self, batch: List[SpanRecord]) -> Dict[str, object]:
+        """Build an OTLP/JSON ExportTraceServiceRequest for `batch`."""
+        spans: List[Dict[str, object]] = []
+        for record in batch:
+            spans.extend(_record_spans(record))
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": _attributes({"service.name": self.service_name})},
+                "scopeSpans": [{
+                    "scope": {"name": "django-xbench", "version": __version__},
+                    "spans": spans,
+                }],
+            }]
+        }
+
+
+def _record_spans(record: SpanRecord) -> List[Dict[str, object]]:
+    trace_id = record.trace_id or os.urandom(16).hex()
+    span_id = os.urandom(8).hex()
+    end_ns = record.start_ns + int(record.duration_s * 1e9)
+    root: Dict[str, object] = {
+        "traceId": trace_id,
+        "spanId": span_id,
+        "name": record.name,
+        "kind": record.kind,
+        "startTimeUnixNano": str(record.start_ns),
+        "endTimeUnixNano": str(end_ns),
+        "attributes": _attributes(record.attributes),
+    }
+    if record.parent_span_id:
+        root["parentSpanId"] = record.parent_span_id
+    if record.error:
+        root["status"] = {"code": _STATUS_ERROR}
+
+    spans = [root]
+    for start, duration, alias, vendor, sql in record.queries:
+        q_start = record.start_ns + int((start - record.perf_start) * 1e9)
+        spans.append({
+            "traceId": trace_id,
+            "spanId": os.urandom(8).hex(),
+            "parentSpanId": span_id,
+            "name": _query_name(sql, alias),
+            "kind": KIND_CLIENT,
+            "startTimeUnixNano": str(q_start),
+            "endTimeUnixNano": str(q_start + int(duration * 1e9)),
+            "attributes": _attributes({
+                "db.system": vendor,
+                "db.name": alias,
+                "db.statement": str(sql)[:_MAX_STATEMENT],
+            }),
+        })
+    return spans
+
+
+def _query_name(sql, alias: str) -> str:
+    words = str(sql).split(None, 1)
+    return f"{words[0].upper() if words else 'QUERY'} {alias}"
+
+
+def _attributes(values: Dict[str, object]) -> List[Dict[str, object]]:
+    attrs = []
+    for key, value in values.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            typed = {"boolValue": value}
+        elif isinstance(value, int):
+            typed = {"intValue": str(value)}
+        elif isinstance(value, float):
+            typed = {"doubleValue": value}
+        else:
+            typed = {"stringValue": str(value)}
+        attrs.append({"key": key, "value": typed})
+    return attrs
+
+
+def submit_span(
+    measurement,
+    name: str,
+    kind: int,
+    attributes: Dict[str, object],
+    *,
+    duration_s: Optional[float] = None,
+    extra_queries=(),
+    traceparent: Optional[str] = None,
+    error: bool = False,
+) -> None:
+    """Queue a finished Measurement (started with `trace=True`) for span export."""
+    if SPAN_EXPORTER is None:
+        return
+    trace_id, parent_span_id = parse_traceparent(traceparent)
+    SPAN_EXPORTER.submit(SpanRecord(
+        name=name,
+        kind=kind,
+        start_ns=measurement.wall_start_ns,
+        perf_start=measurement.start,
+        duration_s=measurement.total if duration_s is None else duration_s,
+        attributes=attributes,
+        queries=list(measurement.metrics.query_log or ()) + list(extra_queries),
+        trace_id=trace_id,
+        parent_span_id=parent_span_id,
+        error=error,
+    ))
+
+
+def measurement_attributes(measurement) -> Dict[str, object]:
+    """xbench.* span attributes for a finished Measurement (times in ms)."""
+    metrics = measurement.metrics
+    return {
+        "xbench.total_ms": measurement.total * 1000,
+        "xbench.db_ms": metrics.db_duration * 1000,
+        "xbench.app_ms": max(0.0, measurement.total - metrics.db_duration) * 1000,
+        "xbench.cpu_ms": measurement.cpu_time * 1000,
+        "xbench.gc_ms": metrics.gc_time * 1000,
+        "xbench.queries": metrics.db_queries,
+        "xbench.queries_not_exported": metrics.query_log_dropped or None,
+    }
+
+
+SPAN_EXPORTER = (
+    SpanExporter(
+        XBENCH_SPAN_EXPORT,
+        service_name=XBENCH_SPAN_SERVICE_NAME,
+        queue_size=XBENCH_SPAN_QUEUE_SIZE,
+        batch_size=XBENCH_SPAN_BATCH_SIZE,
+        interval=XBENCH_SPAN_FLUSH_INTERVAL,
+    )
+    if XBENCH_SPAN_EXPORT
+    else None
+)
+SPAN_MAX_QUERIES = XBENCH_SPAN_MAX_QUERIES
@@ -0,0 +1,197 @@
+from time import perf_counter, thread_time
+
+from asgiref.sync import sync_to_async
+
+from .context import RequestMetrics, metrics_ctx
+from .db import instrument_connections
+from .overhead import TIMER_COST
+
+
+class StreamTimer:
+    """
+    Measure the body phase of a streaming response.
+
+    Records time-to-first-byte and time-to-last-byte (relative to `start`,
+    the request start), bytes sent, DB work done while the body is
+    iterated, and CPU time of the thread producing each chunk (sync
+    bodies only: async chunks share the event loop thread).
+    `on_done(timer)` is called exactly once, when the body is
+    exhausted or the response is closed (client disconnects included).
+    """
+
+    __slots__ = (
+        "start", "first_byte", "last_byte", "bytes_sent", "cpu", "metrics", "on_done", "_done",
+    )
+
+    def __init__(self, start, on_done):
+        self.start = start
+        self.first_byte = None
+        self.last_byte = None
+        self.bytes_sent = 0
+        self.cpu = 0.0
+        self.metrics = RequestMetrics()
+        self.on_done = on_done
+        self._done = False
+
+    @property
+    def ttfb(self):
+        return (self.first_byte if self.first_byte is not None else self.finish_time) - self.start
+
+    @property
+    def ttlb(self):
+        return self.finish_time - self.start
+
+    @property
+    def finish_time(self):
+        return self.last_byte if self.last_byte is not None else self.start
+
+    def chunk(self, data, now=None):
+        if now is None:
+            now = perf_counter()
+        if self.first_byte is None:
+            self.first_byte = now
+        self.last_byte = now
+        self.bytes_sent += len(data)
+
+    def finish(self):
+        if self._done:
+            return
+        self._done = True
+        if self.last_byte is None:
+            self.last_byte = perf_counter()
+        self.on_done(self)
+
+
+def wrap_streaming(response, start, on_done):
+    """
+    Attach a StreamTimer to a streaming response.
+
+    File responses served through `wsgi.file_wrapper` keep their sendfile
+    path: only completion (on close) and `Content-Length` are recorded.
+    Other bodies are wrapped so each chunk is produced with the request's
+    connections instrumented; async bodies instrument the thread-sensitive
+    executor that runs their `sync_to_async` queries.
+    """
+    timer = StreamTimer(start, on_done)
+
+    if getattr(response, "file_to_stream", None) is not None:
+        def close_file():
+            try:
+                timer.bytes_sent = int(response.get("Content-Length", 0))
+            except ValueError:
+                pass
+            timer.finish()
+
+        response._resource_closers.append(close_file)
+        return timer
+
+    if getattr(response, "is_async", False):
+        body = _BodyInstrument(timer.metrics)
+        response.streaming_content = _aiter_timed(response.streaming_content, timer, body)
+        # The ASGI handler closes the response on the thread-sensitive executor,
+        # the same thread the instrument was entered on.
+        response._resource_closers.append(body.exit)
+    else:
+        response.streaming_content = _iter_timed(response.streaming_content, timer)
+    # Covers bodies that are closed before being iterated at all.
+    response._resource_closers.append(timer.finish)
+    return timer
+
+
+def _iter_timed(content, timer):
+    it = iter(content)
+    metrics = timer.metrics
+    instrument = None
+    try:
+        while True:
+            step_start = perf_counter()
+            # The context is scoped to each step: the server may run
+            # unrelated code on this thread between chunks, and the cursor
+            # wrappers only record while it is set.
+            token = metrics_ctx.set(metrics)
+            if instrument is None:
+                # Installed once for the whole body, not per chunk.
+                instrument = instrument_connections()
+                instrument.__enter__()
+            cpu_start = thread_time()
+            next_start = perf_counter()
+            try:
+                chunk = next(it)
+            except StopIteration:
+                return
+            finally:
+                next_end = perf_counter()
+                timer.cpu += thread_time() - cpu_start
+                metrics_ctx.reset(token)
+                # Bookkeeping around `next()`, plus the two reads not covered.
+                metrics.overhead += (next_start - step_start) + (perf_counter() - next_end) + 2 * TIMER_COST
+            timer.chunk(chunk, next_end)
+            yield chunk
+    finally:
+        if instrument is not None:
+            exit_start = perf_counter()
+            instrument.__exit__(None, None, None)
+            metrics.overhead += perf_counter() - exit_start + TIMER_COST
+        timer.finish()
+
+
+class _BodyInstrument:
+    """
+    Connection instrumentation of an async body, exited exactly once.
+
+    Async generators have no `close()` for the response to call, and their
+    own `finally` only runs once they are collected; `exit()` is therefore
+    also registered as a response closer.
+    """
+
+    __slots__ = ("metrics", "_instrument")
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self._instrument = None
+
+    @property
+    def active(self):
+        return self._instrument is not None
+
+    def enter(self):
+        self._instrument = instrument_connections()
+        self._instrument.__enter__()
+
+    def exit(self):
+        instrument, self._instrument = self._instrument, None
+        if instrument is None:
+            return
+        exit_start = perf_counter()
+        instrument.__exit__(None, None, None)
+        self.metrics.overhead += perf_counter() - exit_start + TIMER_COST
+
+
+async def _aiter_timed(content, timer, body):
+    it = content.__aiter__()
+    metrics = timer.metrics
+    try:
+        while True:
+            step_start = perf_counter()
+            next_start = step_start
+            token = metrics_ctx.set(metrics)
+            try:
+                if not body.active:
+                    # An async body queries through `sync_to_async`, i.e. on the
+                    # thread-sensitive executor: instrument that thread's
+                    # connections for the life of the body.
+                    await sync_to_async(body.enter)()
+                next_start = perf_counter()
+                chunk = await it.__anext__()
+            except StopAsyncIteration:
+                return
+            finally:
+                next_end = perf_counter()
+                metrics_ctx.reset(token)
+                metrics.overhead += (next_start - step_start) + (perf_counter() - next_end) + 2 * TIMER_COST
+            timer.chunk(chunk, next_end)
+            yield chunk
+    finally:
+        if body.active:
+            await sync_to_async(body.exit)()
+        timer.finish()
@@ -0,0 +1,233 @@
+"""
+Measure work outside the request cycle: management commands, task-queue jobs.
+
+    import django_xbench as xbench
+
+    @xbench.measure("task:send_digest")
+    def send_digest():
+        ...
+
+    with xbench.measure("task:nightly_rollup"):
+        ...
+
+Measured blocks are recorded in the slow-endpoint window under their name,
+so they are ranked next to HTTP endpoints.
+"""
+import logging
+from functools import wraps
+from time import perf_counter, thread_time, time_ns
+
+from . import gctrack
+from .conf import get_config
+from .context import RequestMetrics, metrics_ctx
+from .db import CONN_EVENTS, instrument_connections
+from .memory import MemoryProbe
+from .overhead import TIMER_COST
+from .slowagg import EXPORTER, WINDOW
+from .spans import KIND_INTERNAL, SPAN_EXPORTER, SPAN_MAX_QUERIES, measurement_attributes, submit_span
+
+logger = logging.getLogger("django_xbench")
+
+# Last measured cost of WINDOW.update (seconds), see record().
+_update_cost = 0.0
+
+
+class Measurement:
+    """
+    Wall/CPU time, DB queries, GC pauses and connection events of one unit of work.
+
+    `begin()` makes a fresh RequestMetrics the current scope and instruments
+    every connection of this thread; `end()` stops the clocks; `close()`
+    restores the previous scope, folding the counters into it if there was
+    one. The middleware drives the three steps itself; other code uses
+    `measure()`. With `trace=True` individual queries and the wall-clock
+    start are kept for span export.
+    """
+
+    __slots__ = (
+        "metrics", "probe", "start", "wall_start_ns", "total", "cpu_time", "overhead", "rss_delta", "alloc_peak",
+        "_memory_rate", "_cpu_start", "_setup_done", "_parent", "_token", "_instrument",
+    )
+
+    def __init__(self, memory_sample_rate=None, trace=False):
+        self.metrics = RequestMetrics()
+        if trace:
+            self.metrics.enable_query_log(SPAN_MAX_QUERIES)
+        self.wall_start_ns = None
+        self.probe = None
+        self.total = 0.0
+        self.cpu_time = 0.0
+        self.overhead = 0.0
+        self.rss_delta = None
+        self.alloc_peak = None
+        self._memory_rate = memory_sample_rate
+        self._instrument = None
+
+    def begin(self):
+        self._parent = metrics_ctx.get()
+        self._token = metrics_ctx.set(self.metrics)
+        if self.metrics.query_log is not None:
+            self.wall_start_ns = time_ns()
+        self.start = perf_counter()
+        self._cpu_start = thread_time()
+        if self._memory_rate is not None:
+            # Inside the timed setup: starting tracemalloc is not free.
+            self.probe = MemoryProbe(self._memory_rate)
+        self._instrument = instrument_connections()
+        self._instrument.__enter__()
+        self._setup_done = perf_counter()
+
+    def end(self):
+        body_done = perf_counter()
+        instrument, self._instrument = self._instrument, None
+        instrument.__exit__(None, None, None)
+        if self.probe is not None:
+            self.rss_delta, self.alloc_peak = self.probe.stop()
+        end = perf_counter()
+        self.cpu_time = thread_time() - self._cpu_start
+        self.total = end - self.start
+        # Self-cost so far: wrapper and memory probe setup/teardown plus
+        # per-query bookkeeping.
+        self.overhead = (
+            (self._setup_done - self.start)
+            + (end - body_done)
+            + self.metrics.overhead
+            + 3 * TIMER_COST
+        )
+        return end
+
+    def close(self):
+        if self._instrument is not None:
+            # The body raised before end().
+            self._instrument.__exit__(None, None, None)
+            self._instrument = None
+        if self.probe is not None and self.probe.traced:
+            self.probe.stop()
+        metrics_ctx.reset(self._token)
+        if self._parent is not None:
+            # Nested inside another scope (e.g. a test recorder): report upwards too.
+            self._parent.merge_from(self.metrics)
+
+    def merge_stream(self, metrics):
+        """Report a streaming body's counters upwards too, as `close()` did for the request."""
+        if self._parent is not None:
+            self._parent.merge_from(metrics)
+
+    def fields(self):
+        """Counters as `WINDOW.update` kwargs (everything except overhead)."""
+        metrics = self.metrics
+        return dict(
+            duration_s=self.total,
+            db_s=metrics.db_duration,
+            query_count=metrics.db_queries,
+            cpu_s=self.cpu_time,
+            gc_s=metrics.gc_time,
+            gc_count=metrics.gc_count,
+            gc_gen2_count=metrics.gc_gen2_count,
+            rss_delta=self.rss_delta,
+            alloc_peak=self.alloc_peak,
+            **conn_fields(metrics),
+        )
+
+
+class TaskMeasurement:
+    """Context manager / decorator returned by `measure()`."""
+
+    def __init__(self, name):
+        self.name = name
+        self.measurement = None
+
+    def __enter__(self):
+        cfg = get_config()
+        if not cfg.enabled:
+            self.measurement = None
+            return self
+        gctrack.install()
+        self.measurement = Measurement(
+            cfg.memory_sample_rate if cfg.memory else None, trace=SPAN_EXPORTER is not None
+        )
+        self.measurement.begin()
+        return self
+
+    def __exit__(self, *exc_info):
+        m = self.measurement
+        if m is None:
+            return False
+        try:
+            m.end()
+            cfg = get_config()
+            if cfg.slow_agg_enabled:
+                record(self.name, overhead_s=m.overhead, **m.fields())
+            if cfg.log_enabled:
+                log(cfg, self.name, m.total, m.metrics.db_duration, m.metrics.db_queries, m.cpu_time)
+            if SPAN_EXPORTER is not None:
+                submit_span(
+                    m, self.name, KIND_INTERNAL, measurement_attributes(m),
+                    error=exc_info[0] is not None,
+                )
+        finally:
+            m.close()
+        return False
+
+    def __call__(self, fn):
+        @wraps(fn)
+        def run(*args, **kwargs):
+            # A fresh instance per call: the decorated function may run
+            # concurrently or recursively.
+            with TaskMeasurement(self.name):
+                return fn(*args, **kwargs)
+
+        return run
+
+
+def measure(name):
+    """
+    Measure a block or function like a request and record it under `name`.
+
+    Use a prefix such as "task:" so jobs are easy to tell apart from URL
+    routes in the snapshot. Queries run on any connection of the current
+    thread are counted; use `threads.propagate` for work handed to other
+    threads. Does nothing when django-xbench is disabled.
+    """
+    return TaskMeasurement(name)
+
+
+def record(key, *, overhead_s, **fields):
+    """Add one sample to WINDOW, charging the previous update's cost as overhead."""
+    global _update_cost
+    update_start = perf_counter()
+    # WINDOW.update cannot time itself; charge the last measured cost.
+    WINDOW.update(key, overhead_s=overhead_s + _update_cost, **fields)
+    _update_cost = perf_counter() - update_start + TIMER_COST
+    if EXPORTER is not None:
+        EXPORTER.ensure_running()
+
+
+def conn_fields(*scopes):
+    """Connection setup / commit / rollback totals as `WINDOW.update` kwargs."""
+    fields = {}
+    for kind in CONN_EVENTS:
+        seconds, count = 0.0, 0
+        for scope in scopes:
+            s, c = scope.conn_totals(kind)
+            seconds += s
+            count += c
+        fields[f"{kind}_s"] = seconds
+        fields[f"{kind}_count"] = count
+    return fields
+
+
+def log(cfg, label, total, db_time, query_count, cpu_time, extra=""):
+    app_time = max(0.0, total - db_time)
+    msg = (
+        f"[XBENCH] {label} | "
+        f"xbench_total={total * 1000:.3f}ms "
+        f"xbench_db={db_time * 1000:.3f}ms "
+        f"xbench_app={app_time * 1000:.3f}ms "
+        f"xbench_cpu={cpu_time * 1000:.3f}ms "
+        f"q={query_count}{extra}"
+    )
+    if cfg.log_level == "debug":
+        logger.debug(msg)
+    else:
+        logger.info(msg)
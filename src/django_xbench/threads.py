@@ -0,0 +1,85 @@
+import atexit
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .context import metrics_ctx
+from .db import instrument_connections
+
+
+def propagate(fn):
+    """
+    Wrap `fn` so it runs with the caller's context and instrumented connections.
+
+    Use it when handing ORM work to another thread, e.g.
+    `executor.submit(propagate(load_page), 2)`. Django connections are
+    per-thread, so the wrapper also installs `instrument_cursor` on the worker
+    thread's connections for the duration of the call; queries then count
+    towards the originating request.
+    """
+    ctx = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        # A Context can only be entered by one thread at a time; copy per call.
+        return ctx.copy().run(_call_instrumented, fn, args, kwargs)
+
+    return run
+
+
+def _call_instrumented(fn, args, kwargs):
+    metrics = metrics_ctx.get()
+    if metrics is None or metrics.thread_id == threading.get_ident():
+        return fn(*args, **kwargs)
+    with instrument_connections():
+        return fn(*args, **kwargs)
+
+
+class XBenchThreadPoolExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor whose `submit()` (and thus `map()`) applies `propagate`."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(propagate(fn), *args, **kwargs)
+
+
+class PerProcessThread:
+    """
+    A daemon thread started lazily, once per process.
+
+    `ensure_running()` is a cheap pid check once the thread runs. Threads do
+    not survive `fork()`, so a forked child starts its own on first use:
+    `on_start` runs first (e.g. to drop state inherited from the parent),
+    then the thread starts and `at_exit` is registered. `at_exit` only runs
+    in the process that registered it, not in children forked afterwards.
+    """
+
+    __slots__ = ("target", "name", "on_start", "at_exit", "_pid", "_lock")
+
+    def __init__(self, target, name, *, on_start=None, at_exit=None):
+        self.target = target
+        self.name = name
+        self.on_start = on_start
+        self.at_exit = at_exit
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_running(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            if self.on_start is not None:
+                self.on_start()
+            # Set after on_start: callers that skip the lock must see its effects.
+            self._pid = pid
+            threading.Thread(target=self.target, name=self.name, daemon=True).start()
+            if self.at_exit is not None:
+                atexit.register(self._run_at_exit, pid)
+
+    def _run_at_exit(self, pid):
+        if os.getpid() == pid:
+            self.at_exit()
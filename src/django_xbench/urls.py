@@ -1,6 +1,9 @@
 from django.urls import include, path
 
+from .views import xbench_control
+
 urlpatterns = [
     # XBench developer endpoints (do not expose publicly without auth)
+    path("__xbench__/", xbench_control, name="xbench-control"),
     path("__xbench__/", include("django_xbench.slowagg.urls")),
 ]
@@ -0,0 +1,65 @@
+import json
+
+from django.http import HttpResponseForbidden, JsonResponse
+from django.views.decorators.http import require_http_methods
+
+from . import conf, spans
+from .slowagg.views import _is_allowed
+
+
+@require_http_methods(["GET", "POST"])
+def xbench_control(request):
+    """
+    Inspect or change runtime settings of this process.
+
+    Usage:
+      GET  /__xbench__/
+      POST /__xbench__/   {"SAMPLE_RATE": 0.1, "SLOW_AGG": true}
+      POST /__xbench__/   {"RESET": true}
+
+    Notes:
+      - GET follows the dashboard's access rule (DEBUG or staff); POST
+        always requires a staff user, since it changes live behaviour.
+      - Changes apply to the serving process only. Use `CONTROL_FILE` to
+        toggle every worker on a host.
+      - POST is CSRF-protected like any other Django view.
+    """
+    if not _is_allowed(request):
+        return HttpResponseForbidden("xbench control access denied")
+
+    if request.method == "POST":
+        if not _is_staff(request):
+            return HttpResponseForbidden("xbench control changes require a staff user")
+        if request.content_type == "application/json":
+            try:
+                payload = json.loads(request.body or b"{}")
+            except ValueError:
+                return JsonResponse({"error": "invalid JSON body"}, status=400)
+            if not isinstance(payload, dict):
+                return JsonResponse({"error": "expected a JSON object"}, status=400)
+        else:
+            payload = request.POST.dict()
+
+        payload = {str(k).upper(): v for k, v in payload.items()}
+        try:
+            # Form posts carry strings: "false" / "0" must not reset.
+            if conf._to_bool(payload.pop("RESET", False)):
+                conf.clear_overrides()
+            if payload:
+                conf.set_overrides(**payload)
+        except ValueError as exc:
+            return JsonResponse({"error": str(exc)}, status=400)
+
+    return JsonResponse(
+        {
+            "config": conf.get_config().to_dict(),
+            "overrides": conf.get_overrides(),
+            "control_file": conf.XBENCH_CONTROL_FILE,
+            "span_export": spans.SPAN_EXPORTER.stats() if spans.SPAN_EXPORTER is not None else None,
+        }
+    )
+
+
+def _is_staff(request):
+    user = getattr(request, "user", None)
+    return bool(user and user.is_authenticated and (user.is_staff or user.is_superuser))
@@ -0,0 +1,12 @@
+import pytest
+
+from django_xbench import conf
+
+pytest_plugins = ["pytester"]
+
+
+@pytest.fixture
+def runtime_overrides():
+    """Runtime config overrides made by the test are cleared afterwards."""
+    yield
+    conf.clear_overrides()
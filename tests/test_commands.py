@@ -0,0 +1,172 @@
+import json
+import os
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from django_xbench.slowagg.export import ExportReader, WindowExporter
+from django_xbench.slowagg.window import RollingWindow
+
+
+def test_xbench_replay_reports_top_endpoints(tmp_path):
+    log = tmp_path / "access.jsonl"
+    log.write_text(
+        "\n".join(
+            json.dumps(row)
+            for row in [
+                {"timestamp": 100, "endpoint": "a/", "duration_s": 0.5, "db_s": 0.1, "query_count": 3},
+                {"timestamp": 101, "endpoint": "b/", "duration_s": 0.1},
+                {"timestamp": 150, "endpoint": "a/", "duration_s": 0.5},
+            ]
+        )
+    )
+
+    out = StringIO()
+    call_command("xbench_replay", str(log), "--json", "--batch-size", "2", stdout=out)
+    snap = json.loads(out.getvalue())
+
+    assert snap["samples"] == 3
+    assert [r["endpoint"] for r in snap["top"]] == ["a/", "b/"]
+    assert snap["top"][0]["count"] == 2
+
+
+def test_xbench_replay_reads_csv(tmp_path):
+    log = tmp_path / "access.csv"
+    log.write_text("timestamp,endpoint,duration_s\n100,a/,0.25\n")
+
+    out = StringIO()
+    call_command("xbench_replay", str(log), stdout=out)
+    assert "a/" in out.getvalue()
+    assert "250.00 ms" in out.getvalue()
+
+
+def test_xbench_replay_covers_logs_longer_than_the_live_window(tmp_path):
+    log = tmp_path / "day.jsonl"
+    # Two days of samples: far wider than the configured live window.
+    log.write_text("\n".join(
+        json.dumps({"timestamp": 100 + i * 3600, "endpoint": "a/", "duration_s": 0.1}) for i in range(48)
+    ))
+
+    out = StringIO()
+    call_command("xbench_replay", str(log), "--json", stdout=out)
+    snap = json.loads(out.getvalue())
+    assert snap["samples_in_window"] == 48
+    assert snap["window_seconds"] >= 47 * 3600
+    assert snap["top"][0]["count"] == 48
+
+    out = StringIO()
+    call_command("xbench_replay", str(log), "--json", "--live-window", stdout=out)
+    assert json.loads(out.getvalue())["samples_in_window"] == 1
+
+
+def test_xbench_replay_reports_unwritable_dump(tmp_path):
+    log = tmp_path / "access.jsonl"
+    log.write_text(json.dumps({"timestamp": 100, "endpoint": "a/", "duration_s": 0.1}))
+
+    with pytest.raises(CommandError, match="cannot write"):
+        call_command("xbench_replay", str(log), "--dump", str(tmp_path / "missing" / "w.xbw"), stdout=StringIO())
+
+
+def test_xbench_top_merges_worker_exports(tmp_path):
+    win = RollingWindow(bucket_seconds=10, bucket_count=6)
+    win.update("a/", duration_s=0.2, db_s=0.1, query_count=4)
+    win.update("b/", duration_s=0.9)
+    WindowExporter(win, str(tmp_path)).export_once()
+
+    # A second "worker" export for the same endpoint.
+    other = tmp_path / "xbench-999999.json"
+    other.write_text(json.dumps({"endpoints": {"a/": {"count": 3, "total": 3.0, "max": 1.5}}}))
+
+    out = StringIO()
+    call_command("xbench_top", "--dir", str(tmp_path), "--once", "--sort", "count", stdout=out)
+    text = out.getvalue()
+
+    assert "workers=2" in text
+    lines = [line for line in text.splitlines() if line.strip().startswith("1 ")]
+    assert lines and lines[0].split()[1] == "4"
+    assert lines[0].endswith("a/")
+
+
+def test_xbench_merge_combines_host_dumps(tmp_path):
+    dumps = []
+    for host, rows in enumerate([
+        [{"timestamp": 100, "endpoint": "a/", "duration_s": 0.4}, {"timestamp": 101, "endpoint": "b/", "duration_s": 0.5}],
+        [{"timestamp": 102, "endpoint": "a/", "duration_s": 0.4}, {"timestamp": 103, "endpoint": "c/", "duration_s": 0.6}],
+    ]):
+        log = tmp_path / f"host{host}.jsonl"
+        log.write_text("\n".join(json.dumps(row) for row in rows))
+        dump = tmp_path / f"host{host}.xbw"
+        call_command("xbench_replay", str(log), "--dump", str(dump), stdout=StringIO())
+        dumps.append(str(dump))
+
+    out = StringIO()
+    merged = tmp_path / "fleet.xbw"
+    call_command("xbench_merge", *dumps, "--json", "--output", str(merged), stdout=out)
+    snap = json.loads(out.getvalue())
+
+    assert snap["sources"] == 2
+    assert [r["endpoint"] for r in snap["top"]] == ["a/", "c/", "b/"]
+    assert snap["top"][0]["count"] == 2
+
+    out = StringIO()
+    call_command("xbench_merge", str(merged), stdout=out)
+    assert "a/" in out.getvalue()
+
+
+def test_xbench_merge_reads_worker_export_dumps(tmp_path):
+    paths = []
+    for worker, endpoint in enumerate(["a/", "b/"]):
+        win = RollingWindow(bucket_seconds=10, bucket_count=6)
+        win.update(endpoint, duration_s=0.2)
+        win.update("a/", duration_s=0.1)
+        exporter = WindowExporter(win, str(tmp_path / f"w{worker}"), dump_interval=10)
+        (tmp_path / f"w{worker}").mkdir()
+        exporter._export_at_exit()
+        paths.append(exporter.dump_path)
+
+    out = StringIO()
+    call_command("xbench_merge", *paths, "--json", stdout=out)
+    snap = json.loads(out.getvalue())
+    assert snap["sources"] == 2
+    assert {r["endpoint"]: r["count"] for r in snap["top"]} == {"a/": 3, "b/": 1}
+
+    # Expired exports of exited workers take their dump with them.
+    os.utime(exporter.path, (1, 1))
+    ExportReader(str(tmp_path / "w1"), max_age=30).read()
+    assert os.listdir(tmp_path / "w1") == []
+
+
+def test_xbench_diff_compares_two_files(tmp_path):
+    paths = []
+    for name, duration in [("before", 0.1), ("after", 0.4)]:
+        log = tmp_path / f"{name}.jsonl"
+        log.write_text("\n".join(
+            json.dumps({"timestamp": 100 + i, "endpoint": "a/", "duration_s": duration + 0.001 * i})
+            for i in range(20)
+        ))
+        out = StringIO()
+        call_command("xbench_replay", str(log), "--json", stdout=out)
+        snap = tmp_path / f"{name}.json"
+        snap.write_text(out.getvalue())
+        paths.append(str(snap))
+
+    out = StringIO()
+    call_command("xbench_diff", *paths, "--json", stdout=out)
+    row = json.loads(out.getvalue())["rows"][0]
+    assert row["endpoint"] == "a/"
+    assert row["significant"] is True
+    assert row["avg_delta"] > 0.29
+
+    out = StringIO()
+    call_command("xbench_diff", *paths, stdout=out)
+    assert "a/" in out.getvalue()
+
+
+def test_xbench_diff_rejects_malformed_json(tmp_path):
+    bad = tmp_path / "bad.json"
+    bad.write_text(json.dumps({"endpoints": ["a/"]}))
+
+    with pytest.raises(CommandError, match="endpoints"):
+        call_command("xbench_diff", str(bad), str(bad), stdout=StringIO())
@@ -0,0 +1,123 @@
+import json
+import os
+
+import pytest
+from django.http import JsonResponse
+from django.urls import include, path
+
+from django_xbench import conf
+
+
+def _ping_urls():
+    def view(request):
+        return JsonResponse({"ok": True})
+
+    return type("TmpUrls", (), {"urlpatterns": [path("ping/", view)]})
+
+
+def test_runtime_toggle_disables_middleware_without_restart(client, settings, runtime_overrides):
+    settings.ROOT_URLCONF = _ping_urls()
+
+    conf.set_overrides(ENABLED=False)
+    assert "Server-Timing" not in client.get("/ping/").headers
+
+    conf.clear_overrides()
+    assert "xbench-total" in client.get("/ping/").headers["Server-Timing"]
+
+
+def test_sample_rate_zero_skips_instrumentation(client, settings, runtime_overrides):
+    settings.ROOT_URLCONF = _ping_urls()
+
+    conf.set_overrides(SAMPLE_RATE="0")
+    assert "X-Bench-Queries" not in client.get("/ping/").headers
+
+
+def test_set_overrides_rejects_unknown_keys(runtime_overrides):
+    with pytest.raises(ValueError):
+        conf.set_overrides(NOPE=1)
+    with pytest.raises(ValueError):
+        conf.set_overrides(ENABLED="maybe")
+
+
+def test_control_file_is_polled(tmp_path, monkeypatch, runtime_overrides):
+    control = tmp_path / "xbench.json"
+    monkeypatch.setattr(conf, "XBENCH_CONTROL_FILE", str(control))
+    monkeypatch.setattr(conf, "XBENCH_CONTROL_POLL_SECONDS", 0.0)
+    monkeypatch.setattr(conf, "_control_mtime", None)
+    monkeypatch.setattr(conf, "_next_poll", 0.0)
+
+    control.write_text(json.dumps({"SAMPLE_RATE": 0.25, "LOG": "on"}))
+    cfg = conf.get_config()
+    assert cfg.sample_rate == 0.25
+    assert cfg.log_enabled is True
+
+    # Broken edits are ignored; the last good config stays active.
+    control.write_text("{not json")
+    os.utime(control, (1, 1))
+    assert conf.get_config().sample_rate == 0.25
+
+    control.unlink()
+    assert conf.get_config().sample_rate == 1.0
+
+
+def _control_urls():
+    return type("TmpUrls", (), {"urlpatterns": [path("", include("django_xbench.urls"))]})
+
+
+@pytest.fixture
+def staff_client(client, django_user_model):
+    client.force_login(django_user_model.objects.create_user("ops", is_staff=True))
+    return client
+
+
+@pytest.mark.django_db
+def test_control_endpoint_updates_config(staff_client, settings, runtime_overrides):
+    client = staff_client
+    settings.DEBUG = True
+    settings.ROOT_URLCONF = _control_urls()
+
+    res = client.post(
+        "/__xbench__/", data={"SLOW_AGG": False, "SAMPLE_RATE": 0.5},
+        content_type="application/json",
+    )
+    assert res.status_code == 200
+    assert res.json()["config"]["sample_rate"] == 0.5
+    assert conf.get_config().slow_agg_enabled is False
+
+    res = client.post("/__xbench__/", data={"RESET": True}, content_type="application/json")
+    assert res.json()["overrides"] == {}
+
+    assert client.post(
+        "/__xbench__/", data={"BOGUS": 1}, content_type="application/json"
+    ).status_code == 400
+
+
+@pytest.mark.django_db
+def test_control_endpoint_form_reset_is_parsed(staff_client, settings, runtime_overrides):
+    settings.ROOT_URLCONF = _control_urls()
+    conf.set_overrides(SAMPLE_RATE=0.5)
+
+    res = staff_client.post("/__xbench__/", data={"RESET": "false"})
+    assert res.status_code == 200
+    assert res.json()["overrides"] == {"sample_rate": 0.5}
+
+    assert staff_client.post("/__xbench__/", data={"RESET": "maybe"}).status_code == 400
+
+    res = staff_client.post("/__xbench__/", data={"RESET": "1"})
+    assert res.json()["overrides"] == {}
+
+
+def test_control_endpoint_requires_staff(client, settings):
+    settings.DEBUG = False
+    settings.ROOT_URLCONF = _control_urls()
+    assert client.get("/__xbench__/").status_code == 403
+
+
+def test_control_endpoint_post_requires_staff_even_in_debug(client, settings, runtime_overrides):
+    settings.DEBUG = True
+    settings.ROOT_URLCONF = _control_urls()
+    assert client.get("/__xbench__/").status_code == 200
+
+    res = client.post("/__xbench__/", data={"ENABLED": False}, content_type="application/json")
+    assert res.status_code == 403
+    assert conf.get_overrides() == {}
@@ -0,0 +1,124 @@
+import os
+import subprocess
+import sys
+import textwrap
+from time import sleep
+
+import pytest
+from django.db import connection
+
+import django_xbench as xbench
+from django_xbench import conf, tasks
+from django_xbench.slowagg import WINDOW
+from django_xbench.slowagg.export import ExportReader, WindowExporter
+from django_xbench.slowagg.window import RollingWindow
+
+
+def _query(count=1):
+    with connection.cursor() as cur:
+        for _ in range(count):
+            cur.execute("SELECT 1")
+
+
+@pytest.mark.django_db
+def test_measure_records_tasks_next_to_endpoints(runtime_overrides):
+    @xbench.measure("task:rollup")
+    def rollup(count):
+        _query(count)
+        return count
+
+    conf.set_overrides(SLOW_AGG=True)
+    assert rollup(3) == 3
+    with xbench.measure("task:digest") as task:
+        _query()
+
+    stats = WINDOW.aggregate()
+    assert stats["task:rollup"].count == 1
+    assert stats["task:rollup"].query_total == 3
+    assert stats["task:digest"].query_total == 1
+    assert task.measurement.metrics.db_queries == 1
+    keys = [row["endpoint"] for row in WINDOW.snapshot(n=100)["top"]]
+    assert "task:rollup" in keys
+
+
+@pytest.mark.django_db
+def test_measure_records_failures_and_nests(runtime_overrides):
+    conf.set_overrides(SLOW_AGG=True)
+    with xbench.measure("task:outer") as outer:
+        _query()
+        with pytest.raises(ValueError):
+            with xbench.measure("task:inner"):
+                _query(2)
+                raise ValueError
+
+    stats = WINDOW.aggregate()
+    assert stats["task:inner"].query_total == 2
+    # The inner block's queries count towards the outer one exactly once.
+    assert stats["task:outer"].query_total == 3
+    assert outer.measurement.metrics.db_queries == 3
+
+
+def test_measure_is_a_no_op_when_disabled(runtime_overrides):
+    conf.set_overrides(ENABLED=False)
+    with xbench.measure("task:off") as task:
+        pass
+
+    assert task.measurement is None
+
+
+def test_short_lived_process_reaches_export_reader(tmp_path):
+    (tmp_path / "cron_settings.py").write_text(textwrap.dedent(f"""
+        from examples.config.settings import *
+        XBENCH = {{**XBENCH, "SLOW_EXPORT_DIR": {str(tmp_path / "exports")!r}, "SLOW_EXPORT_INTERVAL": 60}}
+    """))
+    script = "import django; django.setup()\n" \
+        "import django_xbench as xbench\n" \
+        "with xbench.measure('task:cron'): pass\n"
+    env = {
+        **os.environ,
+        "DJANGO_SETTINGS_MODULE": "cron_settings",
+        "PYTHONPATH": os.pathsep.join([str(tmp_path), os.getcwd(), os.path.join(os.getcwd(), "src")]),
+    }
+    subprocess.run([sys.executable, "-c", script], env=env, check=True, timeout=60)
+
+    # The process exited long before its first periodic export was due.
+    stats, workers = ExportReader(str(tmp_path / "exports")).read()
+    assert workers == 1
+    assert stats["task:cron"].count == 1
+
+
+def test_export_reader_drops_finished_processes_after_max_age(tmp_path):
+    win = RollingWindow(bucket_seconds=10, bucket_count=6)
+    win.update("task:cron", duration_s=0.1)
+    finished = WindowExporter(win, str(tmp_path)).export_once(exited=True)
+    stuck = tmp_path / "xbench-999999.json"
+    stuck.write_text('{"endpoints": {}}')
+    for path in (finished, stuck):
+        os.utime(path, (1, 1))
+
+    assert ExportReader(str(tmp_path), max_age=30).read() == ({}, 0)
+    assert not os.path.exists(finished)
+    assert stuck.exists()
+
+
+def test_memory_probe_cost_is_reported_as_overhead(monkeypatch):
+    class SlowProbe:
+        traced = False
+
+        def __init__(self, sample_rate):
+            sleep(0.005)
+
+        def stop(self):
+            sleep(0.005)
+            return 0, None
+
+    monkeypatch.setattr(tasks, "MemoryProbe", SlowProbe)
+    measurement = tasks.Measurement(memory_sample_rate=1.0)
+    measurement.begin()
+    try:
+        measurement.end()
+    finally:
+        measurement.close()
+
+    assert measurement.overhead >= 0.01
+    assert measurement.total >= measurement.overhead
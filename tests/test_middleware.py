@@ -1,8 +1,21 @@
+import gc
+import tracemalloc
+from time import perf_counter, sleep, time
+
 import pytest
-from django.db import connection
-from django.http import JsonResponse
+from asgiref.sync import async_to_sync, sync_to_async
+from django.db import connection, transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.test import AsyncClient
 from django.urls import path
 
+from django_xbench import conf, middleware
+from django_xbench.context import RequestMetrics, metrics_ctx
+from django_xbench.db import instrument_connections, instrument_cursor
+from django_xbench.queuetime import parse_request_start
+from django_xbench.slowagg import WINDOW
+from django_xbench.streaming import wrap_streaming
+
 
 def test_server_timing_header(client, settings):
     def view(request):
@@ -94,3 +107,371 @@ def test_contextvars_are_reset_between_requests(client, settings):
 
     # Should NOT accumulate (ex: 1 -> 2)
     assert abs(q2 - q1) <= 1
+
+
+@pytest.mark.django_db
+def test_overhead_metric_and_aggregation(client, settings, runtime_overrides):
+    def view(request):
+        with connection.cursor() as cur:
+            cur.execute("SELECT 1")
+        return JsonResponse({"ok": True})
+
+    settings.ROOT_URLCONF = type(
+        "TmpUrls",
+        (),
+        {"urlpatterns": [path("overhead/", view)]},
+    )
+
+    conf.set_overrides(OVERHEAD_HEADER=True, SLOW_AGG=True)
+    res = client.get("/overhead/")
+
+    timing = res.headers["Server-Timing"]
+    assert "xbench-overhead;dur=" in timing
+    assert float(timing.split("xbench-overhead;dur=")[1].split(",")[0]) > 0.0
+
+    stats = WINDOW.aggregate()["overhead/"]
+    assert stats.overhead_total > 0.0
+    assert stats.to_dict()["avg_overhead"] == stats.avg_overhead
+
+
+@pytest.mark.django_db
+def test_query_bookkeeping_is_charged_as_overhead(monkeypatch):
+    add_query = RequestMetrics.add_query
+
+    def slow_add_query(self, duration, overhead=0.0):
+        sleep(0.002)
+        add_query(self, duration, overhead)
+
+    monkeypatch.setattr(RequestMetrics, "add_query", slow_add_query)
+    metrics = RequestMetrics()
+    token = metrics_ctx.set(metrics)
+    try:
+        with instrument_connections(), connection.cursor() as cur:
+            cur.execute("SELECT 1")
+            cur.execute("SELECT 1")
+    finally:
+        metrics_ctx.reset(token)
+
+    # Each add_query is charged on the next query.
+    assert metrics.db_queries == 2
+    assert metrics.overhead >= 0.002
+
+
+def test_overhead_includes_work_before_the_measurement_starts(client, settings, monkeypatch, runtime_overrides):
+    settings.ROOT_URLCONF = type("TmpUrls", (), {"urlpatterns": [path("setup/", lambda r: HttpResponse())]})
+    conf.set_overrides(OVERHEAD_HEADER=True)
+    get_config = middleware.get_config
+
+    def slow_get_config():
+        sleep(0.005)
+        return get_config()
+
+    monkeypatch.setattr(middleware, "get_config", slow_get_config)
+    timing = client.get("/setup/").headers["Server-Timing"]
+
+    assert float(timing.split("xbench-overhead;dur=")[1].split(",")[0]) >= 5.0
+
+
+@pytest.mark.django_db
+def test_streaming_response_records_time_to_last_byte(client, settings, runtime_overrides):
+    def rows():
+        with connection.cursor() as cur:
+            for i in range(3):
+                cur.execute("SELECT 1")
+                sleep(0.01)
+                yield f"row-{i}\n"
+
+    def view(request):
+        return StreamingHttpResponse(rows())
+
+    settings.ROOT_URLCONF = type(
+        "TmpUrls",
+        (),
+        {"urlpatterns": [path("export/", view)]},
+    )
+
+    conf.set_overrides(SLOW_AGG=True)
+    res = client.get("/export/")
+    # Headers are sent before the body is produced.
+    assert res.headers["X-Bench-Queries"] == "0"
+    assert "export/" not in WINDOW.aggregate()
+    body = b"".join(res.streaming_content)
+    res.close()
+
+    stats = WINDOW.aggregate()["export/"]
+    assert stats.count == 1
+    assert stats.stream_count == 1
+    assert stats.bytes_total == len(body)
+    assert stats.query_total == 3
+    assert stats.stream_db_total > 0.0
+    assert stats.max >= 0.03
+    assert stats.avg_ttfb < stats.max
+
+
+@pytest.mark.django_db
+def test_streaming_body_installs_query_wrappers_once(client, settings, runtime_overrides):
+    def rows():
+        for i in range(50):
+            yield f"row-{i}\n"
+
+    settings.ROOT_URLCONF = type(
+        "TmpUrls", (), {"urlpatterns": [path("rows/", lambda request: StreamingHttpResponse(rows()))]}
+    )
+
+    conf.set_overrides(SLOW_AGG=True)
+    res = client.get("/rows/")
+    it = iter(res.streaming_content)
+    next(it)
+    installed = connection.execute_wrappers.count(instrument_cursor)
+    # Between chunks: wrapper in place, but queries run here are not the body's.
+    with connection.cursor() as cur:
+        cur.execute("SELECT 1")
+    list(it)
+    res.close()
+
+    assert installed == 1
+    assert instrument_cursor not in connection.execute_wrappers
+    stats = WINDOW.aggregate()["rows/"]
+    assert stats.query_total == 0
+    # Per-chunk bookkeeping is charged as overhead.
+    assert stats.overhead_total > 0.0
+
+
+@pytest.mark.django_db
+def test_async_streaming_body_counts_sync_to_async_queries(settings, runtime_overrides):
+    def query():
+        with connection.cursor() as cur:
+            cur.execute("SELECT 1")
+
+    async def rows():
+        for i in range(3):
+            await sync_to_async(query)()
+            yield f"row-{i}\n"
+
+    async def view(request):
+        return StreamingHttpResponse(rows())
+
+    settings.ROOT_URLCONF = type("TmpUrls", (), {"urlpatterns": [path("arows/", view)]})
+
+    async def fetch():
+        res = await AsyncClient().get("/arows/")
+        return b"".join([chunk async for chunk in res.streaming_content])
+
+    conf.set_overrides(SLOW_AGG=True)
+    body = async_to_sync(fetch)()
+
+    stats = WINDOW.aggregate()["arows/"]
+    assert body == b"row-0\nrow-1\nrow-2\n"
+    assert stats.query_total == 3
+    assert stats.stream_db_total > 0.0
+
+
+@pytest.mark.django_db
+def test_abandoned_async_body_uninstalls_query_wrappers_on_close():
+    async def rows():
+        for i in range(3):
+            yield f"row-{i}\n"
+
+    def installed():
+        return instrument_cursor in connection.execute_wrappers
+
+    async def abandon():
+        res = StreamingHttpResponse(rows())
+        finished = []
+        wrap_streaming(res, perf_counter(), finished.append)
+        # The client reads one chunk and disconnects; the generator is never exhausted.
+        await res.streaming_content.__anext__()
+        during = await sync_to_async(installed)()
+        await sync_to_async(res.close)()
+        return during, await sync_to_async(installed)(), finished
+
+    during, after, finished = async_to_sync(abandon)()
+
+    assert during and not after
+    assert len(finished) == 1
+
+
+def test_cpu_time_separates_compute_from_waiting(client, settings, runtime_overrides):
+    def _dur(timing, name):
+        return float(timing.split(f"{name};dur=")[1].split(",")[0])
+
+    def busy(request):
+        deadline = perf_counter() + 0.03
+        while perf_counter() < deadline:
+            pass
+        return JsonResponse({"ok": True})
+
+    def idle(request):
+        sleep(0.03)
+        return JsonResponse({"ok": True})
+
+    settings.ROOT_URLCONF = type(
+        "TmpUrls",
+        (),
+        {"urlpatterns": [path("cpu/busy/", busy), path("cpu/idle/", idle)]},
+    )
+
+    conf.set_overrides(SLOW_AGG=True)
+    busy_timing = client.get("/cpu/busy/").headers["Server-Timing"]
+    idle_timing = client.get("/cpu/idle/").headers["Server-Timing"]
+
+    assert _dur(busy_timing, "xbench-cpu") >= 20.0
+    assert _dur(idle_timing, "xbench-cpu") < _dur(idle_timing, "xbench-total") / 2
+
+    ranked = [k for k, _ in WINDOW.top_n(50, sort="cpu_total") if k.startswith("cpu/")]
+    assert ranked == ["cpu/busy/", "cpu/idle/"]
+
+
+def test_gc_pauses_are_attributed_to_the_request(client, settings, runtime_overrides):
+    def view(request):
+        gc.collect()
+        return JsonResponse({"ok": True})
+
+    settings.ROOT_URLCONF = type(
+        "TmpUrls",
+        (),
+        {"urlpatterns": [path("gc/", view)]},
+    )
+
+    conf.set_overrides(SLOW_AGG=True)
+    res = client.get("/gc/")
+
+    gc_ms = float(res.headers["Server-Timing"].split("xbench-gc;dur=")[1].split(",")[0])
+    assert gc_ms > 0.0
+
+    stats = WINDOW.aggregate()["gc/"]
+    assert stats.gc_count >= 1
+    assert stats.gc_gen2_count >= 1
+    assert stats.gc_total > 0.0
+
+
+def test_memory_mode_tracks_allocation_peaks(client, settings, runtime_overrides):
+    def big(request):
+        blob = [bytes(1024) for _ in range(4096)]  # ~4 MiB, released before returning
+        return JsonResponse({"n": len(blob)})
+
+    def small(request):
+        return JsonResponse({"ok": True})
+
+    settings.ROOT_URLCONF = type(
+        "TmpUrls",
+        (),
+        {"urlpatterns": [path("mem/big/", big), path("mem/small/", small)]},
+    )
+
+    conf.set_overrides(SLOW_AGG=True, MEMORY=True, MEMORY_SAMPLE_RATE=1.0)
+    client.get("/mem/big/")
+    client.get("/mem/small/")
+
+    assert not tracemalloc.is_tracing()
+    agg = WINDOW.aggregate()
+    big_stats, small_stats = agg["mem/big/"], agg["mem/small/"]
+    assert big_stats.mem_samples == 1 and big_stats.rss_count == 1
+    assert big_stats.alloc_peak_max >= 4 * 1024 * 1024
+    assert big_stats.mem_damage > small_stats.mem_damage
+    ranked = [k for k, _ in WINDOW.top_n(100, sort="mem_damage") if k.startswith("mem/")]
+    assert ranked[0] == "mem/big/"
+
+
+@pytest.mark.parametrize(
+    "value",
+    ["t=1700000000.250", "1700000000250", "t=1700000000250000", "1700000000250000000"],
+)
+def test_parse_request_start_formats(value):
+    assert parse_request_start(value) == pytest.approx(1700000000.25)
+
+
+def test_queue_time_from_proxy_header(client, settings, runtime_overrides):
+    def view(request):
+        return JsonResponse({"ok": True})
+
+    settings.ROOT_URLCONF = type(
+        "TmpUrls",
+        (),
+        {"urlpatterns": [path("queued/", view)]},
+    )
+
+    conf.set_overrides(SLOW_AGG=True)
+    started = f"t={time() - 0.2:.3f}"
+    # Off by default: clients can send the header themselves.
+    ignored = client.get("/queued/", HTTP_X_REQUEST_START=started)
+    conf.set_overrides(QUEUE_TIME=True)
+    res = client.get("/queued/", HTTP_X_REQUEST_START=started)
+    plain = client.get("/queued/")
+
+    assert "xbench-queue" not in ignored.headers["Server-Timing"]
+
+    queue_ms = float(res.headers["Server-Timing"].split("xbench-queue;dur=")[1].split(",")[0])
+    assert 150.0 <= queue_ms < 5000.0
+    assert "xbench-queue" not in plain.headers["Server-Timing"]
+
+    stats = WINDOW.aggregate()["queued/"]
+    assert stats.queue_count == 1
+    assert stats.queue_max >= 0.15
+    assert WINDOW.snapshot(n=1)["queue"]["max"] >= 0.15
+
+
+@pytest.mark.django_db(transaction=True)
+def test_commit_and_rollback_are_broken_out(client, settings):
+    def committed(request):
+        with transaction.atomic():
+            with connection.cursor() as cur:
+                cur.execute("SELECT 1")
+        return JsonResponse({"ok": True})
+
+    def rolled_back(request):
+        try:
+            with transaction.atomic():
+                with connection.cursor() as cur:
+                    cur.execute("SELECT 1")
+                raise ValueError
+        except ValueError:
+            pass
+        return JsonResponse({"ok": True})
+
+    settings.ROOT_URLCONF = type(
+        "TmpUrls",
+        (),
+        {"urlpatterns": [path("tx/commit/", committed), path("tx/rollback/", rolled_back)]},
+    )
+
+    res = client.get("/tx/commit/")
+    assert "xbench-commit-default;dur=" in res.headers["Server-Timing"]
+    assert "xbench-rollback-" not in res.headers["Server-Timing"]
+
+    res = client.get("/tx/rollback/")
+    assert "xbench-rollback-default;dur=" in res.headers["Server-Timing"]
+
+    agg = WINDOW.aggregate()
+    assert agg["tx/commit/"].commit_count >= 1
+    assert agg["tx/commit/"].rollback_count == 0
+    assert agg["tx/rollback/"].rollback_count >= 1
+    assert agg["tx/rollback/"].to_dict()["rollback_total"] >= 0.0
+
+
+def test_response_size_and_throughput_per_endpoint(client, settings, runtime_overrides):
+    def small(request):
+        return JsonResponse({"ok": True})
+
+    def large(request):
+        res = HttpResponse(b"x" * 5000)
+        res.write(b"y" * 5000)  # two chunks, no Content-Length
+        return res
+
+    settings.ROOT_URLCONF = type(
+        "TmpUrls",
+        (),
+        {"urlpatterns": [path("size/small/", small), path("size/large/", large)]},
+    )
+
+    conf.set_overrides(SLOW_AGG=True)
+    client.get("/size/small/")
+    client.get("/size/large/")
+    client.get("/size/large/")
+
+    agg = WINDOW.aggregate()
+    assert agg["size/small/"].avg_bytes == len(b'{"ok": true}')
+    assert agg["size/large/"].bytes_total == 20000
+    assert agg["size/large/"].app_throughput > 0.0
+    ranked = [k for k, _ in WINDOW.top_n(50, sort="avg_bytes") if k.startswith("size/")]
+    assert ranked == ["size/large/", "size/small/"]
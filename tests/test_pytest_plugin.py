@@ -0,0 +1,118 @@
+import json
+from pathlib import Path
+
+import pytest
+from django.db import connection
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import path
+
+from django_xbench import conf
+
+ROOT = Path(__file__).resolve().parents[1]
+
+INNER_TESTS = """
+import pytest
+from django.db import connection
+from django.http import JsonResponse
+from django.urls import path
+
+
+def view(request):
+    with connection.cursor() as cur:
+        for _ in range(3):
+            cur.execute("SELECT 1")
+    return JsonResponse({"ok": True})
+
+
+@pytest.fixture(autouse=True)
+def urls(settings):
+    settings.ROOT_URLCONF = type("U", (), {"urlpatterns": [path("v/", view)]})
+
+
+@pytest.mark.django_db
+@pytest.mark.xbench(max_queries=2)
+def test_over_budget(client):
+    client.get("/v/")
+
+
+@pytest.mark.django_db
+@pytest.mark.xbench(max_queries=3)
+def test_within_budget(client):
+    client.get("/v/")
+"""
+
+
+@pytest.fixture
+def inner(pytester):
+    pytester.makeini(
+        f"""
+        [pytest]
+        DJANGO_SETTINGS_MODULE = examples.config.settings
+        pythonpath = {ROOT} {ROOT / "src"}
+        """
+    )
+    pytester.makepyfile(test_inner=INNER_TESTS)
+    return pytester
+
+
+def test_marker_budget_and_report(inner):
+    result = inner.runpytest_subprocess("--xbench-report=report.json")
+
+    result.assert_outcomes(passed=1, failed=1)
+    result.stdout.fnmatch_lines(["*xbench: 3 queries > max_queries=2*"])
+    report = json.loads((inner.path / "report.json").read_text())
+    assert report["tests"]["test_inner.py::test_within_budget"]["queries"] == 3
+
+
+def test_baseline_regression(inner):
+    baseline = {"version": 1, "tests": {"test_inner.py::test_within_budget": {"queries": 1, "db_ms": 0.0}}}
+    (inner.path / "baseline.json").write_text(json.dumps(baseline))
+
+    result = inner.runpytest_subprocess("--xbench-baseline=baseline.json", "-k", "within")
+
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(["*3 queries > baseline 1*"])
+
+
+def test_missing_baseline_is_a_usage_error(inner):
+    result = inner.runpytest_subprocess("--xbench-baseline=missing.json")
+
+    assert result.ret == pytest.ExitCode.USAGE_ERROR
+    result.stderr.fnmatch_lines(["*--xbench-baseline: cannot read missing.json*"])
+
+
+@pytest.mark.django_db
+def test_recorder_fixture_counts_client_requests(client, settings, xbench):
+    def view(request):
+        with connection.cursor() as cur:
+            cur.execute("SELECT 1")
+        return JsonResponse({"ok": True})
+
+    settings.ROOT_URLCONF = type("TmpUrls", (), {"urlpatterns": [path("rec/", view)]})
+
+    client.get("/rec/")
+    client.get("/rec/")
+    with connection.cursor() as cur:
+        cur.execute("SELECT 1")
+
+    assert xbench.queries == 3
+
+
+@pytest.mark.django_db
+def test_recorder_fixture_counts_streaming_body_queries(client, settings, xbench, runtime_overrides):
+    def rows():
+        with connection.cursor() as cur:
+            for i in range(3):
+                cur.execute("SELECT 1")
+                yield f"row-{i}\n"
+
+    settings.ROOT_URLCONF = type(
+        "TmpUrls", (), {"urlpatterns": [path("stream/", lambda request: StreamingHttpResponse(rows()))]}
+    )
+
+    conf.set_overrides(SLOW_AGG=True)
+    res = client.get("/stream/")
+    b"".join(res.streaming_content)
+    res.close()
+
+    assert xbench.queries == 3
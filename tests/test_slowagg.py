@@ -0,0 +1,242 @@
+import threading
+import time
+from dataclasses import fields
+
+import pytest
+from django.urls import include, path
+
+from django_xbench.slowagg import SNAPSHOT_CACHE, WINDOW
+from django_xbench.slowagg.bucket import Bucket
+from django_xbench.slowagg.cache import SnapshotCache
+from django_xbench.slowagg.diff import diff, split_window
+from django_xbench.slowagg.dump import dumps, loads
+from django_xbench.slowagg.stats import MAX_FIELDS, EndpointStats
+from django_xbench.slowagg.window import RollingWindow
+
+
+def test_snapshot_cache_reuses_entry_within_bucket_and_ttl():
+    clock = [0.0]
+    win = RollingWindow(bucket_seconds=10, bucket_count=6)
+    cache = SnapshotCache(win, ttl=5.0, clock=lambda: clock[0])
+    start = win.current_bucket_start
+
+    win.update("a/", duration_s=0.1, now=start)
+    e1 = cache.get(5, now=start)
+
+    # New data inside the same bucket is not visible until the TTL expires.
+    win.update("b/", duration_s=0.2, now=start)
+    assert cache.get(5, now=start) is e1
+
+    clock[0] = 6.0
+    e2 = cache.get(5, now=start)
+    assert e2 is not e1
+    assert e2.etag != e1.etag
+    assert [r["endpoint"] for r in e2.snapshot["top"]] == ["b/", "a/"]
+
+
+def test_snapshot_cache_rebuilds_on_rotation_with_stable_etag():
+    win = RollingWindow(bucket_seconds=10, bucket_count=6)
+    cache = SnapshotCache(win, ttl=60.0, clock=lambda: 0.0)
+    start = win.current_bucket_start
+
+    win.update("a/", duration_s=0.1, now=start)
+    e1 = cache.get(5, now=start)
+    e2 = cache.get(5, now=start + 10)
+
+    # Rotation forces a rebuild, but identical rows keep the same validator.
+    assert e2 is not e1
+    assert e2.etag == e1.etag
+
+
+def test_slow_snapshot_returns_304_for_matching_etag(client, settings):
+    settings.DEBUG = True
+    settings.ROOT_URLCONF = type(
+        "TmpUrls",
+        (),
+        {"urlpatterns": [path("__xbench__/", include("django_xbench.slowagg.urls"))]},
+    )
+    SNAPSHOT_CACHE.clear()
+    WINDOW.update("etag/", duration_s=0.05)
+
+    res = client.get("/__xbench__/slow/?n=5")
+    assert res.status_code == 200
+    etag = res.headers["ETag"]
+
+    res2 = client.get("/__xbench__/slow/?n=5", HTTP_IF_NONE_MATCH=etag)
+    assert res2.status_code == 304
+
+    res3 = client.get("/__xbench__/slow/ui/?n=5", HTTP_IF_NONE_MATCH=etag)
+    assert res3.status_code == 200
+
+
+def test_slow_snapshot_etag_and_body_share_one_entry(client, settings, monkeypatch):
+    settings.DEBUG = True
+    settings.ROOT_URLCONF = type(
+        "TmpUrls",
+        (),
+        {"urlpatterns": [path("__xbench__/", include("django_xbench.slowagg.urls"))]},
+    )
+    # A zero TTL rebuilds on every get(): a second lookup would return a new entry.
+    monkeypatch.setattr(SNAPSHOT_CACHE, "ttl", 0.0)
+    calls = []
+    original = SNAPSHOT_CACHE.get
+    monkeypatch.setattr(SNAPSHOT_CACHE, "get", lambda *a, **kw: calls.append(1) or original(*a, **kw))
+    WINDOW.update("etag-once/", duration_s=0.05)
+
+    res = client.get("/__xbench__/slow/?n=5")
+
+    assert res.status_code == 200
+    assert len(calls) == 1
+
+
+def test_update_many_places_samples_in_their_buckets():
+    win = RollingWindow(bucket_seconds=10, bucket_count=3)
+    win.reset(now=1000)
+
+    applied = win.update_many(
+        [
+            (1025, "b/", 0.2, 0.1, 2),
+            (1001, "a/", 0.1, 0.0, 1),
+            (1012, "a/", 0.3, 0.0, 1),
+            (990, "old/", 9.0, 0.0, 0),  # before the window once it reaches 1020
+        ]
+    )
+    assert applied == 3
+    agg = win.aggregate(now=1025)
+    assert agg["a/"].count == 2
+    assert agg["a/"].max == 0.3
+    assert agg["b/"].query_total == 2
+    assert "old/" not in agg
+
+    # One more bucket evicts the 1000-1009 bucket.
+    win.update_columns([1030], ["b/"], [0.1])
+    assert win.aggregate(now=1030)["a/"].count == 1
+
+
+def test_window_dump_round_trip_keeps_buckets():
+    win = RollingWindow(bucket_seconds=10, bucket_count=3, endpoint_cap=50)
+    win.reset(now=1000)
+    win.update("a/", duration_s=0.5, db_s=0.1, query_count=3, cpu_s=0.2, now=1001)
+    win.update("b/", duration_s=0.1, queue_s=0.05, commit_s=0.01, commit_count=1, now=1012)
+    win.update("a/", duration_s=0.2, now=1025)
+
+    copy = loads(dumps(win, now=1025))
+
+    assert (copy.bucket_seconds, copy.bucket_count, copy.endpoint_cap) == (10, 3, 50)
+    assert copy.current_bucket_start == 1020
+    assert copy.aggregate(now=1025) == win.aggregate(now=1025)
+    # Still bucket-aligned: advancing one bucket evicts the oldest samples.
+    assert copy.aggregate(now=1030)["a/"].count == 1
+    assert copy.aggregate(now=1030)["b/"].commit_count == 1
+
+
+def test_window_dump_packs_float_counts_as_ints():
+    win = RollingWindow(bucket_seconds=10, bucket_count=3)
+    win.update("a/", duration_s=0.1, query_count=2.0)
+
+    stats = loads(dumps(win)).aggregate()["a/"]
+
+    assert stats.query_total == 2 and isinstance(stats.query_total, int)
+
+
+def test_window_merge_gives_global_ranking():
+    host1 = RollingWindow(bucket_seconds=10, bucket_count=6)
+    host2 = RollingWindow(bucket_seconds=10, bucket_count=6)
+    host1.reset(now=1000)
+    host2.reset(now=1010)
+    # Each host's top-1 is its own hot endpoint; "shared/" wins fleet-wide.
+    host1.update("h1/", duration_s=1.0, now=1000)
+    host2.update("h2/", duration_s=1.0, now=1010)
+    for _ in range(3):
+        host1.update("shared/", duration_s=0.3, now=1005)
+        host2.update("shared/", duration_s=0.3, now=1015)
+
+    fleet = RollingWindow(bucket_seconds=10, bucket_count=6)
+    fleet.reset(now=0)
+    assert fleet.merge_from(loads(dumps(host1, now=1005))) == 4
+    assert fleet.merge_from(loads(dumps(host2, now=1015))) == 4
+
+    assert fleet.current_bucket_start == 1010
+    top = fleet.top_n(1, now=1010)
+    assert top[0][0] == "shared/"
+    assert top[0][1].count == 6
+
+    with pytest.raises(ValueError):
+        fleet.merge_from(RollingWindow(bucket_seconds=5, bucket_count=2))
+
+
+def test_endpoint_stats_merge_covers_every_field():
+    names = [f.name for f in fields(EndpointStats)]
+    a = EndpointStats(**{name: 1 for name in names})
+    b = EndpointStats(**{name: 2 for name in names})
+
+    a.merge_from(b)
+
+    for name in names:
+        assert getattr(a, name) == (2 if name in MAX_FIELDS else 3), name
+
+
+def test_window_dump_rejects_bad_input():
+    data = dumps(RollingWindow(bucket_seconds=10, bucket_count=2))
+    for bad in (b"", b"nope" + data[4:], data[:-4]):
+        with pytest.raises(ValueError):
+            loads(bad)
+
+
+def test_diff_ranks_changes_with_significance():
+    win = RollingWindow(bucket_seconds=10, bucket_count=5)
+    win.reset(now=1000)
+    for now, slower in ((1000, 0.10), (1020, 0.30)):
+        for i in range(40):
+            jitter = 0.01 * (i % 5)
+            win.update("slower/", duration_s=slower + jitter, query_count=2, now=now)
+            win.update("steady/", duration_s=0.20 + jitter, query_count=1, now=now)
+        win.update("rare/", duration_s=0.1 if now == 1000 else 0.9, now=now)
+    win.update("added/", duration_s=1.0, query_count=9, now=1030)
+    win.update("partial/", duration_s=1.0, now=1040)
+
+    before, after = split_window(win, now=1045)
+    rows = {r.endpoint: r for r in diff(before, after, n=10)}
+
+    # The current bucket is still filling up and belongs to neither side.
+    assert "partial/" not in rows
+
+    assert rows["slower/"].significant and rows["slower/"].avg_z > 10
+    assert not rows["steady/"].significant
+    assert not rows["rare/"].significant  # large change, one request per side
+    assert rows["added/"].status == "new"
+    assert diff(before, after, n=1)[0].endpoint == "slower/"
+    assert [r.endpoint for r in diff(before, after, sort="avg_q", significant_only=True)] == ["slower/"]
+
+
+def test_concurrent_rotation_advances_the_window_once(monkeypatch):
+    # Exporter threads and request threads rotate the same window.
+    clear = Bucket.clear
+
+    def slow_clear(self):
+        time.sleep(0.0005)  # widen the race window
+        clear(self)
+
+    monkeypatch.setattr(Bucket, "clear", slow_clear)
+    win = RollingWindow(bucket_seconds=10, bucket_count=6)
+    base = 1_000_000
+    win.reset(now=base)
+
+    for step in range(1, 20):
+        now = base + step * 10
+        barrier = threading.Barrier(8)
+
+        def rotate():
+            barrier.wait()
+            win.rotate_if_needed(now=now)
+
+        threads = [threading.Thread(target=rotate) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        win.update("a/", duration_s=0.1, now=now)
+
+        assert win.current_bucket_start == now
+        assert win._bucket_at(now) is win.buckets[step % 6]
+        assert win._bucket_at(now).data["a/"].count == 1
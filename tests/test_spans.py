@@ -0,0 +1,154 @@
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from django.db import connection
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import path
+
+from django_xbench import middleware, spans, tasks
+from django_xbench.spans import SpanExporter, SpanRecord, parse_traceparent
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture
+def use_exporter(monkeypatch):
+    def install(exporter):
+        for module in (middleware, spans, tasks):
+            monkeypatch.setattr(module, "SPAN_EXPORTER", exporter)
+        return exporter
+
+    return install
+
+
+def _record(name="GET x/"):
+    return SpanRecord(
+        name=name, kind=spans.KIND_SERVER, start_ns=1_000_000_000, perf_start=10.0,
+        duration_s=0.5, attributes={"xbench.queries": 1}, queries=[(10.1, 0.2, "default", "sqlite", "SELECT 1")],
+    )
+
+
+@pytest.mark.django_db
+def test_request_spans_written_to_file(client, settings, tmp_path, use_exporter):
+    out = tmp_path / "spans.jsonl"
+    exporter = use_exporter(SpanExporter(str(out), service_name="shop"))
+
+    def view(request, pk):
+        with connection.cursor() as cur:
+            cur.execute("SELECT 1")
+            cur.execute("SELECT 2")
+        return JsonResponse({"ok": True})
+
+    settings.ROOT_URLCONF = type("TmpUrls", (), {"urlpatterns": [path("items/<int:pk>/", view)]})
+    client.get("/items/3/", HTTP_TRACEPARENT=f"00-{TRACE_ID}-{PARENT_ID}-01")
+    exporter.flush()
+
+    payload = json.loads(out.read_text().splitlines()[-1])
+    resource = payload["resourceSpans"][0]
+    assert resource["resource"]["attributes"][0]["value"] == {"stringValue": "shop"}
+    root, *queries = resource["scopeSpans"][0]["spans"]
+    assert root["name"] == "GET items/<int:pk>/"
+    assert root["traceId"] == TRACE_ID and root["parentSpanId"] == PARENT_ID
+    attrs = {a["key"]: a["value"] for a in root["attributes"]}
+    assert attrs["xbench.queries"] == {"intValue": "2"}
+    assert attrs["http.response.status_code"] == {"intValue": "200"}
+    assert "xbench.db_ms" in attrs and "xbench.app_ms" in attrs
+    assert [q["name"] for q in queries] == ["SELECT default", "SELECT default"]
+    assert all(q["parentSpanId"] == root["spanId"] for q in queries)
+    assert int(queries[0]["startTimeUnixNano"]) >= int(root["startTimeUnixNano"])
+    assert exporter.stats()["exported"] == 1
+
+
+def test_spans_posted_to_local_collector():
+    received = []
+
+    class Collector(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            received.append((self.path, self.headers["Content-Type"], json.loads(body)))
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Collector)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        exporter = SpanExporter(f"http://127.0.0.1:{server.server_port}/v1/traces", batch_size=10)
+        for _ in range(3):
+            exporter.submit(_record())
+        exporter.flush()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    spans_seen = sum(
+        len(p["resourceSpans"][0]["scopeSpans"][0]["spans"]) for _, _, p in received
+    )
+    assert received[0][:2] == ("/v1/traces", "application/json")
+    assert spans_seen == 6  # 3 requests x (root + 1 query)
+    assert exporter.stats()["exported"] == 3
+
+
+def test_full_queue_drops_instead_of_blocking():
+    exporter = SpanExporter("http://127.0.0.1:9/unreachable", queue_size=2, timeout=0.5)
+    exporter._pid = os.getpid()  # keep the flush thread from draining the queue
+
+    results = [exporter.submit(_record()) for _ in range(5)]
+    assert results == [True, True, False, False, False]
+    assert exporter.stats()["dropped"] == 3
+
+    exporter.flush()
+    assert exporter.stats()["failed"] == 2
+    assert exporter.stats()["pending"] == 0
+
+
+def test_parse_traceparent():
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01") == (TRACE_ID, PARENT_ID)
+    assert parse_traceparent("00-" + "0" * 32 + f"-{PARENT_ID}-01") == (None, None)
+    assert parse_traceparent("garbage") == (None, None)
+
+
+def test_control_view_reports_span_drops(client, settings, tmp_path, use_exporter):
+    exporter = use_exporter(SpanExporter(str(tmp_path / "spans.jsonl"), queue_size=1))
+    exporter.dropped = 4
+    settings.DEBUG = True
+    settings.ROOT_URLCONF = "django_xbench.urls"
+
+    res = client.get("/__xbench__/")
+
+    assert res.json()["span_export"]["dropped"] == 4
+
+
+@pytest.mark.django_db
+def test_streaming_span_covers_the_body(client, settings, tmp_path, use_exporter):
+    out = tmp_path / "spans.jsonl"
+    exporter = use_exporter(SpanExporter(str(out)))
+
+    def rows():
+        for i in range(3):
+            with connection.cursor() as cur:
+                cur.execute("SELECT 1")
+            yield f"{i}\n"
+
+    def view(request):
+        return StreamingHttpResponse(rows())
+
+    settings.ROOT_URLCONF = type("TmpUrls", (), {"urlpatterns": [path("export/", view)]})
+    res = client.get("/export/")
+    b"".join(res.streaming_content)
+    res.close()
+    exporter.flush()
+
+    root, *queries = json.loads(out.read_text())["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    attrs = {a["key"]: a["value"] for a in root["attributes"]}
+    assert attrs["xbench.queries"] == {"intValue": "3"}
+    assert attrs["http.response.body.size"] == {"intValue": "6"}
+    assert "xbench.ttfb_ms" in attrs
+    assert len(queries) == 3
@@ -0,0 +1,110 @@
+import asyncio
+import atexit
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from asgiref.sync import sync_to_async
+from django.db import connection, connections
+from django.http import JsonResponse
+from django.urls import path
+
+from django_xbench.threads import PerProcessThread, XBenchThreadPoolExecutor, propagate
+
+
+def _run_queries(count):
+    with connection.cursor() as cur:
+        for _ in range(count):
+            cur.execute("SELECT 1")
+    return count
+
+
+def _close_thread_connections(_):
+    connections.close_all()
+
+
+def _urls(view):
+    return type("TmpUrls", (), {"urlpatterns": [path("fanout/", view)]})
+
+
+@pytest.mark.django_db(transaction=True)
+def test_thread_pool_fanout_is_counted(client, settings):
+    def view(request):
+        with XBenchThreadPoolExecutor(max_workers=3) as pool:
+            done = sum(pool.map(_run_queries, [2, 2, 2]))
+            pool.map(_close_thread_connections, range(3))
+        return JsonResponse({"done": done})
+
+    settings.ROOT_URLCONF = _urls(view)
+    res = client.get("/fanout/")
+
+    assert int(res.headers["X-Bench-Queries"]) == 6
+
+
+@pytest.mark.django_db(transaction=True)
+def test_propagate_with_plain_executor(client, settings):
+    def view(request):
+        _run_queries(1)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futures = [pool.submit(propagate(_run_queries), 2) for _ in range(2)]
+            [f.result() for f in futures]
+            pool.map(_close_thread_connections, range(2))
+        return JsonResponse({"ok": True})
+
+    settings.ROOT_URLCONF = _urls(view)
+    res = client.get("/fanout/")
+
+    assert int(res.headers["X-Bench-Queries"]) == 5
+
+
+@pytest.mark.django_db(transaction=True)
+def test_sync_to_async_queries_reach_the_request(client, settings):
+    async def view(request):
+        # Concurrent calls each restore their own context copy on completion;
+        # a per-call ContextVar.set() would keep only the last one.
+        await asyncio.gather(
+            sync_to_async(_run_queries)(2),
+            sync_to_async(_run_queries)(3),
+        )
+        return JsonResponse({"ok": True})
+
+    settings.ROOT_URLCONF = _urls(view)
+    res = client.get("/fanout/")
+
+    assert int(res.headers["X-Bench-Queries"]) == 5
+
+
+@pytest.mark.django_db(transaction=True)
+def test_worker_connection_setup_is_timed(client, settings):
+    def view(request):
+        with XBenchThreadPoolExecutor(max_workers=1) as pool:
+            # A fresh worker thread opens its own connection.
+            pool.submit(_run_queries, 1).result()
+            pool.submit(_close_thread_connections, None).result()
+        return JsonResponse({"ok": True})
+
+    settings.ROOT_URLCONF = _urls(view)
+    res = client.get("/fanout/")
+
+    assert "xbench-connect-default;dur=" in res.headers["Server-Timing"]
+    # Session setup during connect() is not counted as a request query.
+    assert int(res.headers["X-Bench-Queries"]) == 1
+
+
+def test_per_process_thread_starts_once(monkeypatch):
+    started, registered = [], []
+    done = threading.Event()
+    monkeypatch.setattr(atexit, "register", lambda fn, *args: registered.append((fn, args)))
+    worker = PerProcessThread(done.wait, "xbench-test", on_start=lambda: started.append(1), at_exit=done.set)
+
+    for _ in range(3):
+        worker.ensure_running()
+
+    assert started == [1]
+    assert len(registered) == 1
+    fn, args = registered[0]
+    fn(os.getpid() + 1)  # inherited by a forked child: skipped
+    assert not done.is_set()
+    fn(*args)
+    assert done.is_set()